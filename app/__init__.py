@@ -1,7 +1,9 @@
 from flask import Flask
 from config import Config
+import logging
 
 app = Flask(__name__)
 app.config.from_object(Config)
+logging.basicConfig(level=Config.LOG_LEVEL)
 
 from app import routes
@@ -1,45 +1,221 @@
 from app import app
-from flask import jsonify, request
-from sentence_processing.definitions import get_definitions
-from sentence_processing.idiom_processing import get_idiom, get_all_idioms_dict
-from time import time
+from flask import Response, abort, jsonify, request
+from sentence_processing.auxiliar_functions import AnalyzedSentence
+from sentence_processing.book_index import get_book_index
+from sentence_processing.definitions import get_targets_ranking
+from sentence_processing.graph_word_wsd import GraphBudget
+from sentence_processing.idiom_reload import IdiomReloader
+from sentence_processing.instrumentation import add_samples, render, timed
+from sentence_processing.lemmatizer import load_morphology
+from sentence_processing.lexicon import get_lexicon
+from sentence_processing.result_cache import ResultCache, get_cache_version
+from sentence_processing.senses import get_senses
+from sentence_processing.wordnet_relations import get_table
+from time import monotonic
+import hmac
 import json
 
-idiom_dict = get_all_idioms_dict()
+get_table()
+get_lexicon()
+load_morphology()
+result_cache = ResultCache(get_cache_version(),
+                           app.config["RESULT_CACHE_PATH"],
+                           app.config["RESULT_CACHE_SIZE"])
+idioms = IdiomReloader(
+    check_interval=app.config["IDIOMS_CHECK_INTERVAL"],
+    on_reload=lambda idiom_dict: result_cache.set_version(
+        get_cache_version()))
+
+
+def get_samples():
+    """
+    (None) -> list.
+
+    Return samples of result cache and idiom dictionary of this process.
+    """
+    stats = result_cache.stats()
+    samples = [("result_cache_hits_total", "counter",
+                "Number of senses found in result cache.", stats["hits"]),
+               ("result_cache_misses_total", "counter",
+                "Number of senses missing in result cache.", stats["misses"]),
+               ("result_cache_bytes", "gauge",
+                "Size of senses kept in result cache.", stats["size"])]
+    return samples + idioms.get_samples()
+
+
+add_samples(get_samples)
+
+
+def get_indexed_senses(book_id, sentence, word, word_order):
+    """
+    (str, str, str, int) -> dict.
+
+    Return precomputed senses of word from index of book or None if book
+    or word is not indexed.
+    """
+    if not book_id:
+        return None
+    try:
+        book_index = get_book_index(app.config["BOOK_INDEX_DIR"], book_id)
+    except ValueError:
+        return None
+    if book_index is None:
+        return None
+    return book_index.lookup(sentence, word, word_order)
+
+
+def get_budget(deadline=None):
+    """
+    (float) -> GraphBudget.
+
+    Return budget of WordNet graph of one sentence. Deadline is shared by
+    all sentences of request and starts now by default.
+    """
+    if deadline is None:
+        deadline = monotonic() + app.config["GRAPH_DEADLINE"]
+    return GraphBudget(app.config["GRAPH_MAX_VERTEXES"],
+                       app.config["GRAPH_MAX_EDGES"], deadline)
+
+
+def cache_senses(sentence, word, word_order, senses, version):
+    """
+    (str, str, int, dict, str) -> None.
+
+    Save senses of word computed for version of result cache. Senses
+    without word definitions are not saved, because they can come from
+    failed Oxford request, as well as degraded senses of fast tier.
+    """
+    if senses["senses"]["word_sense"]["definitions"] and \
+            not senses["degraded"]:
+        result_cache.set(sentence, word, word_order, senses, version)
+
+
+def is_fast(data_dict):
+    """
+    (dict) -> bool.
+
+    Return True if request asks for fast tier, which gives first WordNet
+    senses and only cached Oxford definitions.
+    """
+    tier = data_dict.get("tier", "full")
+    if tier not in ("full", "fast"):
+        abort(400, "tier should be full or fast")
+    return tier == "fast"
 
 
 @app.route("/", methods=["POST"])
+@timed("request")
 def main():
-    """Give user opportunity to get definitions using POST request."""
-    st = time()
+    """
+    Give user opportunity to get definitions using POST request. When
+    deadline of request passes or request has "tier": "fast", senses of
+    fast tier are returned with "degraded": true.
+    """
     data = request.data
     data_dict = json.loads(data)
     sentence = data_dict.get("sentence").lower().strip()
     word = data_dict.get("word").lower().strip()
     word_order = int(data_dict.get("word_order"))
+    fast = is_fast(data_dict)
     # sentence = " My name is Roman ".lower().strip()
     # word = " name ".strip()
     # word_order = 0
-    idiom = True
-    try:
-        i_word, i_category, i_defs = get_idiom(sentence, word, word_order,
-                                               idiom_dict)
-    except TypeError:
-        idiom = False
-    print(time() - st)
-    word, category, defs = get_definitions(sentence, word, word_order)
-    print(time() - st)
-    if(idiom):
-        return jsonify(
-            {"senses":
-                {"word_sense": {"definitions": defs, "category": category},
-                 "idiom_sense": {"definitions": i_defs, "category": i_category,
-                                 "idiom_name": i_word}
-                 },
-             "word": word})
-    else:
-        return jsonify(
-            {"senses":
-                {"word_sense": {"definitions": defs, "category": category},
-                 "idiom_sense": None},
-             "word": word})
+    senses = get_indexed_senses(data_dict.get("book"), sentence, word,
+                                word_order)
+    if senses:
+        return jsonify(senses)
+    senses = result_cache.get(sentence, word, word_order)
+    if senses:
+        return jsonify(senses)
+    version = result_cache.version
+    analysis = AnalyzedSentence(sentence)
+    senses = get_senses(analysis, word, word_order, idioms.get(),
+                        budget=get_budget(), fast=fast)
+    cache_senses(sentence, word, word_order, senses, version)
+    return jsonify(senses)
+
+
+@app.route("/batch", methods=["POST"])
+@timed("batch")
+def batch():
+    """
+    Give user opportunity to get definitions of many words of many
+    sentences using one POST request.
+
+    Every sentence is analyzed once, its idioms are found once and its
+    WordNet graph is shared by all its words.
+    """
+    deadline = monotonic() + app.config["GRAPH_DEADLINE"]
+    version = result_cache.version
+    idiom_dict = idioms.get()
+    data_dict = json.loads(request.data)
+    fast = is_fast(data_dict)
+    book_id = data_dict.get("book")
+    results = []
+    for sentence_dict in data_dict.get("sentences"):
+        sentence = sentence_dict.get("sentence").lower().strip()
+        targets = [(target.get("word").lower().strip(),
+                    int(target.get("word_order")))
+                   for target in sentence_dict.get("targets")]
+        senses = [get_indexed_senses(book_id, sentence, word, word_order) or
+                  result_cache.get(sentence, word, word_order)
+                  for word, word_order in targets]
+        missing = [i for i, indexed in enumerate(senses) if not indexed]
+        if missing:
+            analysis = AnalyzedSentence(sentence)
+            found = [analysis.tokens.count(word) > word_order >= 0
+                     for word, word_order in targets]
+            possible_idioms = idiom_dict.find_idioms(analysis)
+            budget = get_budget(deadline)
+            ranking = None
+            if not fast:
+                ranking = get_targets_ranking(
+                    analysis, [targets[i] for i in missing if found[i]],
+                    budget)
+        for i in missing:
+            word, word_order = targets[i]
+            if found[i]:
+                senses[i] = get_senses(analysis, word, word_order,
+                                       idiom_dict, possible_idioms, ranking,
+                                       budget, fast)
+                cache_senses(sentence, word, word_order, senses[i],
+                             version)
+            else:
+                senses[i] = {"senses": None, "word": word,
+                             "error": "word is not in sentence"}
+        results.append({"sentence": sentence, "targets": senses})
+    return jsonify({"results": results})
+
+
+@app.route("/cache", methods=["GET"])
+def cache_stats():
+    """Give user opportunity to get hits and misses of result cache."""
+    return jsonify(result_cache.stats())
+
+
+@app.route("/admin/reload_idioms", methods=["POST"])
+def reload_idioms():
+    """
+    Give administrator opportunity to reload idiom dictionary from its
+    source file in background. Worker that gets request starts reload at
+    once, other workers start it within a second through generation file.
+    Request has to have X-Admin-Token header equal to ADMIN_TOKEN of
+    config, reloads are disabled without it.
+    """
+    token = app.config["ADMIN_TOKEN"]
+    if not token or not hmac.compare_digest(
+            request.headers.get("X-Admin-Token", ""), token):
+        abort(403)
+    if not idioms.request_reload():
+        return jsonify({"reloading": True, "started": False}), 409
+    return jsonify({"reloading": True, "started": True}), 202
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Give user opportunity to get timings of stages in Prometheus format.
+    Under serve.py metrics of all workers are merged, counters are summed
+    and gauges are labelled with pid of their worker.
+    """
+    return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,67 @@
+"""Compare throughput of one /batch request with the same lookups sent as
+separate requests to /. Result and ranking caches are turned off, so
+repeated rounds are not answered from cache, and Oxford API is replaced
+with offline stub, so network does not take part in timings.
+
+Run from repository root: python -m benchmarks.batch_throughput
+"""
+from time import time
+import json
+from app import app, routes
+from benchmarks.corpus import use_oxford_stub
+from sentence_processing import definitions
+
+PAGE = [
+    ("the bank raised interest rates after the board meeting",
+     ["bank", "raised", "interest", "rates", "board", "meeting"]),
+    ("she gave the book back to him after a week",
+     ["gave", "book", "back", "him", "week"]),
+    ("as soon as i got off the bus, i bumped into a schoolmate",
+     ["soon", "got", "off", "bus", "bumped", "schoolmate"]),
+]
+ROUNDS = 3
+
+
+def single_requests(client):
+    """
+    (FlaskClient) -> int.
+
+    Send every word of PAGE as separate request and return their number.
+    """
+    count = 0
+    for sentence, words in PAGE:
+        for word in words:
+            client.post("/", data=json.dumps({"sentence": sentence,
+                                              "word": word,
+                                              "word_order": 0}))
+            count += 1
+    return count
+
+
+def batch_request(client):
+    """
+    (FlaskClient) -> int.
+
+    Send all words of PAGE in one batch request and return their number.
+    """
+    client.post("/batch", data=json.dumps({"sentences": [
+        {"sentence": sentence,
+         "targets": [{"word": word, "word_order": 0} for word in words]}
+        for sentence, words in PAGE]}))
+    return sum(len(words) for _, words in PAGE)
+
+
+if __name__ == "__main__":
+    routes.result_cache.limit = 0
+    routes.result_cache.path = None
+    definitions.RANKING_CACHE_SIZE = 0
+    use_oxford_stub([{"sentence": sentence, "word": word}
+                     for sentence, words in PAGE for word in words])
+    client = app.test_client()
+    batch_request(client)
+    for send in (single_requests, batch_request):
+        st = time()
+        count = sum(send(client) for _ in range(ROUNDS))
+        elapsed = time() - st
+        print("{}: {} lookups in {:.2f} s, {:.1f} lookups/s".format(
+            send.__name__, count, elapsed, count / elapsed))
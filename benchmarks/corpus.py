@@ -0,0 +1,88 @@
+"""Corpus of representative requests and offline Oxford API for benchmarks.
+
+Every request of corpus.json has kind: noun, verb, adjective, adverb,
+closed_class, separable_idiom or inseparable_idiom.
+"""
+from time import sleep
+import json
+import os
+from sentence_processing import oxford
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "corpus.json")
+STUB_CATEGORIES = ("Conjuction", "Determiner", "Interjection", "Numeral",
+                   "Preposition", "Pronoun", "Adverb", "Adjective", "Noun",
+                   "Verb")
+
+
+class SlowStubBackend(oxford.StubBackend):
+    """Returns entries from dictionary after delay of network request."""
+
+    def __init__(self, entries=None, latency=0):
+        """Initialize backend with dictionary and latency in seconds."""
+        super().__init__(entries)
+        self.latency = latency
+
+    def fetch(self, word):
+        """
+        (self, str) -> dict.
+
+        Return entry of word or None if there is no such word.
+        """
+        if self.latency:
+            sleep(self.latency)
+        return super().fetch(word)
+
+
+def load_corpus(kinds=None, path=CORPUS_PATH):
+    """
+    (list, str) -> list.
+
+    Return requests of corpus that have one of kinds, all by default.
+    """
+    with open(path, encoding="utf-8") as corpus_file:
+        corpus = json.load(corpus_file)
+    return [item for item in corpus if kinds is None or item["kind"] in kinds]
+
+
+def get_stub_entry(word):
+    """
+    (str) -> dict.
+
+    Return entry of word in the form of Oxford API response with one
+    definition for every lexical category.
+    """
+    return {"results": [{"lexicalEntries": [
+        {"lexicalCategory": category,
+         "entries": [{"senses": [{
+             "definitions": ["{} used as {}".format(word, category.lower())],
+             "examples": [{"text": "example of {}".format(word)}]}]}]}
+        for category in STUB_CATEGORIES]}]}
+
+
+def use_oxford_stub(corpus, latency=0):
+    """
+    (list, float) -> SlowStubBackend.
+
+    Replace Oxford API and its persistent cache with offline stub that
+    knows all words of corpus.
+    """
+    words = set(word for item in corpus
+                for word in item["sentence"].split() + [item["word"]])
+    backend = SlowStubBackend({word: get_stub_entry(word) for word in words},
+                              latency)
+    oxford.configure(oxford.LookupCache(path=None), backend)
+    return backend
+
+
+def percentile(values, percent):
+    """
+    (list, float) -> float.
+
+    Return percentile of values using nearest rank.
+    """
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    rank = max(int(round(percent / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
@@ -0,0 +1,108 @@
+"""Compare peak memory and number of live allocations of graphs built by
+build_word_graph for sentences of corpus.json with dict-of-sets graph and
+with integer-indexed Graph, both without budget, and with Graph within
+default budget of requests.
+
+Run from repository root: python -m benchmarks.graph_memory
+"""
+import tracemalloc
+from benchmarks.corpus import load_corpus
+from config import Config
+from sentence_processing import auxiliar_functions as af
+from sentence_processing import definitions
+from sentence_processing import graph_word_wsd
+from sentence_processing.graph_word_wsd import GraphBudget
+
+WN_KINDS = ("noun", "verb", "adjective", "adverb")
+
+
+class SetGraph:
+    """Graph that keeps set of neighbours for every vertex."""
+
+    def __init__(self):
+        """Initialize empty graph."""
+        self.edges = {}
+        self.seeds = set()
+
+    def add_vertex(self, word):
+        """Add vertex to graph with word as data."""
+        if word not in self.edges:
+            self.edges[word] = set()
+
+    def add_edge(self, word1, word2):
+        """Make edge between two vertexes."""
+        self.edges[word1].add(word2)
+        self.edges[word2].add(word1)
+
+    def add_edges(self, words1, words2):
+        """Make edges between pairs of vertexes, adding missing ones."""
+        for word1, word2 in zip(words1, words2):
+            self.add_vertex(word1)
+            self.add_vertex(word2)
+            self.add_edge(word1, word2)
+
+
+def measure(graph_class, lemmas_set, targets, budget=None):
+    """
+    (type, set, set, GraphBudget) -> int, int.
+
+    Return peak traced memory and number of live blocks after building
+    graph of sentence with graph_class within budget.
+    """
+    graph_word_wsd.Graph, original = graph_class, graph_word_wsd.Graph
+    tracemalloc.start()
+    try:
+        graph = graph_word_wsd.build_word_graph(lemmas_set, None,
+                                                budget=budget,
+                                                targets=targets)
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        graph_word_wsd.Graph = original
+    del graph
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+    return peak, blocks
+
+
+def get_requests():
+    """
+    (None) -> list.
+
+    Return sentences of corpus with WordNet part-of-speech and lemmas_set
+    and set of start words of their targets, as built for requests.
+    """
+    sentences = {}
+    for item in load_corpus(WN_KINDS):
+        analysis = af.analyze(item["sentence"])
+        start_word = definitions.get_start_word(analysis, item["word"],
+                                                item["word_order"])
+        if start_word[1] and analysis.get_lemmas_set():
+            sentences.setdefault(item["sentence"], (
+                analysis.get_lemmas_set(), set()))[1].add(start_word)
+    return sorted(sentences.items())
+
+
+if __name__ == "__main__":
+    cases = (("sets", SetGraph, False),
+             ("graph", graph_word_wsd.Graph, False),
+             ("graph+budget", graph_word_wsd.Graph, True))
+    totals = {name: [0, 0] for name, _, _ in cases}
+    requests = get_requests()
+    for sentence, (lemmas_set, targets) in requests:
+        graph_word_wsd.build_word_graph(lemmas_set, None)
+        for name, graph_class, budgeted in cases:
+            budget = None
+            if budgeted:
+                budget = GraphBudget(Config.GRAPH_MAX_VERTEXES,
+                                     Config.GRAPH_MAX_EDGES)
+            peak, blocks = measure(graph_class, lemmas_set, targets, budget)
+            totals[name][0] += peak
+            totals[name][1] += blocks
+            print("{!r} {}: peak {:.1f} KiB, {} live blocks".format(
+                sentence, name, peak / 1024, blocks))
+    for name, (peak, blocks) in totals.items():
+        print("mean of {} sentences {}: peak {:.1f} KiB, {} live "
+              "blocks".format(len(requests), name,
+                              peak / 1024 / len(requests),
+                              blocks // len(requests)))
@@ -0,0 +1,25 @@
+"""Count idioms that are checked for every corpus request with and without
+inverted index of lemmas.
+
+Run from repository root: python -m benchmarks.idiom_candidates
+"""
+from sentence_processing import auxiliar_functions as af
+from sentence_processing.idiom_processing import get_all_idioms_dict
+from benchmarks.corpus import load_corpus
+
+
+if __name__ == "__main__":
+    idiom_dict = get_all_idioms_dict()
+    total = len(idiom_dict.expressions)
+    counts = []
+    for item in load_corpus():
+        analysis = af.AnalyzedSentence(item["sentence"])
+        lemma = analysis.lemmatize_word(item["word"], item["word_order"])
+        sentence_count = len(idiom_dict.get_candidates(analysis.lemmas))
+        word_count = len(idiom_dict.get_candidates(analysis.lemmas, lemma))
+        counts.append((sentence_count, word_count))
+        print("{:<18} {:<10} {:>5} -> {:>4} -> {:>4}".format(
+            item["kind"], item["word"], total, sentence_count, word_count))
+    print("mean: {} -> {:.1f} by sentence -> {:.1f} by word".format(
+        total, sum(count for count, _ in counts) / len(counts),
+        sum(count for _, count in counts) / len(counts)))
@@ -0,0 +1,107 @@
+"""Send corpus requests to definitions server from concurrent clients and
+report latency percentiles and requests per second.
+
+Run from repository root:
+python -m benchmarks.load [CONCURRENCY] [SECONDS] [URL]
+
+Without URL the Flask app is served in this process on PORT with
+offline Oxford stub that answers after OXFORD_LATENCY seconds, and result
+and ranking caches are disabled, so every request is computed.
+"""
+from threading import Thread
+from time import perf_counter, time
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+import json
+import logging
+import sys
+from benchmarks.corpus import load_corpus, percentile, use_oxford_stub
+
+PORT = 5124
+CONCURRENCY = 4
+SECONDS = 30
+OXFORD_LATENCY = 0.2
+
+
+def serve_app(corpus, port=PORT):
+    """
+    (list, int) -> str.
+
+    Serve Flask app with offline Oxford stub in background thread and
+    return its URL.
+    """
+    from werkzeug.serving import make_server
+    use_oxford_stub(corpus, OXFORD_LATENCY)
+    from app import app, routes
+    from sentence_processing import definitions
+    routes.result_cache.limit = 0
+    definitions.RANKING_CACHE_SIZE = 0
+    definitions._rankings.clear()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return "http://127.0.0.1:{}/".format(port)
+
+
+def post(url, item):
+    """
+    (str, dict) -> None.
+
+    Send request of corpus to server.
+    """
+    data = json.dumps({"sentence": item["sentence"], "word": item["word"],
+                       "word_order": item["word_order"]}).encode()
+    urlopen(Request(url, data, {"Content-Type": "application/json"})).read()
+
+
+def client(url, corpus, offset, deadline, latencies, errors):
+    """
+    (str, list, int, float, list, list) -> None.
+
+    Send requests of corpus starting from offset until deadline, adding
+    latencies of answered requests and failed requests to lists.
+    """
+    i = offset
+    while time() < deadline:
+        st = perf_counter()
+        try:
+            post(url, corpus[i % len(corpus)])
+            latencies.append(perf_counter() - st)
+        except (HTTPError, URLError, ConnectionError) as error:
+            errors.append(error)
+        i += 1
+
+
+def run_load(url, corpus, concurrency=CONCURRENCY, seconds=SECONDS):
+    """
+    (str, list, int, int) -> list, list, float.
+
+    Return latencies, errors and elapsed time of load from concurrent
+    clients.
+    """
+    latencies, errors = [], []
+    deadline = time() + seconds
+    threads = [Thread(target=client, args=(url, corpus, i, deadline,
+                                           latencies, errors))
+               for i in range(concurrency)]
+    st = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, perf_counter() - st
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else CONCURRENCY
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else SECONDS
+    corpus = load_corpus()
+    url = sys.argv[3] if len(sys.argv) > 3 else serve_app(corpus)
+    for item in corpus:
+        post(url, item)
+    latencies, errors, elapsed = run_load(url, corpus, concurrency, seconds)
+    print("{} requests, {} errors in {:.1f} s, {:.2f} requests/s".format(
+        len(latencies), len(errors), elapsed, len(latencies) / elapsed))
+    print("p50 {:.1f} ms  p95 {:.1f} ms  p99 {:.1f} ms".format(
+        *(percentile(latencies, percent) * 1000
+          for percent in (50, 95, 99))))
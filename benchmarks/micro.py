@@ -0,0 +1,73 @@
+"""Time stages of request on every sentence of corpus.
+
+Run from repository root: python -m benchmarks.micro [REPEAT] [KIND ...]
+
+Every stage is run REPEAT times per corpus request after warm-up, and
+median and p95 of time per call are reported. Kinds limit corpus to
+requests of those kinds.
+"""
+from time import perf_counter
+import sys
+from benchmarks.corpus import load_corpus, percentile, use_oxford_stub
+from sentence_processing import auxiliar_functions as af
+from sentence_processing import graph_word_wsd
+from sentence_processing.idiom_processing import get_all_idioms_dict
+from sentence_processing.wordnet_relations import get_table
+
+REPEAT = 5
+
+
+def get_stages(corpus, idiom_dict):
+    """
+    (list, IdiomDict) -> list.
+
+    Return (name, function, arguments) of stages for every request of
+    corpus that they can be run on.
+    """
+    stages = []
+    for item in corpus:
+        sentence, word = item["sentence"], item["word"]
+        analysis = af.AnalyzedSentence(sentence)
+        stages.append(("get_lemmatized_sen", af.get_lemmatized_sen,
+                       (sentence,)))
+        stages.append(("find_idioms", idiom_dict.find_idioms, (analysis,)))
+        if not analysis.get_pos_wn(word, item["word_order"]):
+            continue
+        lemmas_set, start_word = analysis.get_lemmas_set(word,
+                                                         item["word_order"])
+        stages.append(("build_word_graph", graph_word_wsd.build_word_graph,
+                       (lemmas_set, start_word)))
+        graph = graph_word_wsd.build_word_graph(lemmas_set, start_word)
+        if not len(graph):
+            continue
+        stages.append(("get_top_synsets", graph_word_wsd.get_top_synsets,
+                       (graph, start_word)))
+    return stages
+
+
+def run(stages, repeat=REPEAT):
+    """
+    (list, int) -> dict.
+
+    Return times of calls of every stage by its name.
+    """
+    times = {}
+    for name, function, arguments in stages:
+        function(*arguments)
+        for _ in range(repeat):
+            st = perf_counter()
+            function(*arguments)
+            times.setdefault(name, []).append(perf_counter() - st)
+    return times
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else REPEAT
+    corpus = load_corpus(sys.argv[2:] or None)
+    use_oxford_stub(corpus)
+    get_table()
+    stages = get_stages(corpus, get_all_idioms_dict())
+    for name, times in run(stages, repeat).items():
+        print("{:<20} {:>6} calls  median {:9.3f} ms  p95 {:9.3f} ms".format(
+            name, len(times), percentile(times, 50) * 1000,
+            percentile(times, 95) * 1000))
@@ -0,0 +1,73 @@
+"""Count POS tagger invocations per request before and after sharing
+AnalyzedSentence between stages.
+
+Run from repository root: python -m benchmarks.tagger_calls
+"""
+from nltk.tag import PerceptronTagger
+from sentence_processing import auxiliar_functions as af
+from sentence_processing.idiom_processing import get_idiom, \
+    get_all_idioms_dict
+
+SAMPLES = [
+    ("maybe it's vice versa", "vice", 0),
+    ("as soon as i got off the bus, i bumped into a schoolmate", "got", 0),
+    ("she gave the book back to him after a week", "gave", 0),
+]
+
+
+class TaggerCounter:
+    """Counts sentences tagged by PerceptronTagger while it is active."""
+
+    def __init__(self):
+        """Initialize counter with zero calls."""
+        self.calls = 0
+        self._tag = PerceptronTagger.tag
+
+    def __enter__(self):
+        """Replace PerceptronTagger.tag with counting wrapper."""
+        def counting_tag(tagger, *args, **kwargs):
+            self.calls += 1
+            return self._tag(tagger, *args, **kwargs)
+        PerceptronTagger.tag = counting_tag
+        return self
+
+    def __exit__(self, *exc_info):
+        """Restore PerceptronTagger.tag."""
+        PerceptronTagger.tag = self._tag
+
+
+def per_stage_analysis(sentence, word, word_order, idiom_dict):
+    """
+    (str, str, int, IdiomDict) -> None.
+
+    Repeat analysis in every stage of request as routes.main did before.
+    """
+    lemmatized_sen = af.get_lemmatized_sen(sentence)
+    af.lemmatize_word(sentence, word, word_order)
+    idiom_dict.find_idioms(lemmatized_sen)
+    tokens_dict = af.get_pos_tokens_dict(sentence)
+    if af.get_pos_wn(word, tokens_dict, word_order):
+        af.get_sen_lemmas_set(sentence, word, word_order)
+
+
+def shared_analysis(sentence, word, word_order, idiom_dict):
+    """
+    (str, str, int, IdiomDict) -> None.
+
+    Analyze sentence once and share it between all stages of request.
+    """
+    analysis = af.AnalyzedSentence(sentence)
+    get_idiom(analysis, word, word_order, idiom_dict)
+    if analysis.get_pos_wn(word, word_order):
+        analysis.get_lemmas_set(word, word_order)
+
+
+if __name__ == "__main__":
+    idiom_dict = get_all_idioms_dict()
+    for sentence, word, word_order in SAMPLES:
+        with TaggerCounter() as before:
+            per_stage_analysis(sentence, word, word_order, idiom_dict)
+        with TaggerCounter() as after:
+            shared_analysis(sentence, word, word_order, idiom_dict)
+        print("{!r}: {} -> {} tagger calls".format(sentence, before.calls,
+                                                   after.calls))
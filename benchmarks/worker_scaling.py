@@ -0,0 +1,123 @@
+"""Measure memory per worker and requests per second of serve.py with
+1 to N pre-forked workers.
+
+Run from repository root on Linux:
+python -m benchmarks.worker_scaling [MAX_WORKERS] [SECONDS]
+
+Result and ranking caches of server are turned off, so every request
+is answered from scratch instead of from cache of the first one.
+
+RSS counts pages shared with master in every worker, PSS splits shared
+pages between processes, so PSS shows the memory a worker really adds.
+"""
+from multiprocessing import cpu_count
+from threading import Thread
+from time import sleep, time
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+import json
+import os
+import subprocess
+import sys
+
+PORT = 5123
+REQUEST = json.dumps({"sentence": "the bank raised interest rates after "
+                                  "the board meeting",
+                      "word": "bank", "word_order": 0}).encode()
+
+
+def post():
+    """
+    (None) -> None.
+
+    Send one request to server.
+    """
+    urlopen(Request("http://127.0.0.1:{}/".format(PORT), REQUEST,
+                    {"Content-Type": "application/json"})).read()
+
+
+def wait_ready(timeout=600):
+    """
+    (int) -> None.
+
+    Wait until server answers requests.
+    """
+    st = time()
+    while time() - st < timeout:
+        try:
+            return post()
+        except (URLError, ConnectionError):
+            sleep(0.5)
+    raise RuntimeError("Server did not start")
+
+
+def get_memory(pid):
+    """
+    (int) -> int, int.
+
+    Return RSS and PSS of process in KiB.
+    """
+    memory = {}
+    with open("/proc/{}/smaps_rollup".format(pid)) as smaps:
+        for line in smaps:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                memory[parts[0]] = int(parts[1])
+    return memory["Rss:"], memory["Pss:"]
+
+
+def get_children(pid):
+    """
+    (int) -> list.
+
+    Return pids of child processes.
+    """
+    with open("/proc/{0}/task/{0}/children".format(pid)) as children:
+        return [int(child) for child in children.read().split()]
+
+
+def measure_rps(clients, seconds):
+    """
+    (int, int) -> float.
+
+    Return requests per second answered to clients sending requests one
+    after another for seconds.
+    """
+    counts = [0] * clients
+    deadline = time() + seconds
+
+    def client(number):
+        while time() < deadline:
+            post()
+            counts[number] += 1
+
+    threads = [Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds
+
+
+if __name__ == "__main__":
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else cpu_count()
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print("workers  rss/worker MiB  pss/worker MiB  requests/s")
+    for workers in range(1, max_workers + 1):
+        env = dict(os.environ, WORKERS=str(workers),
+                   BIND="127.0.0.1:{}".format(PORT), RESULT_CACHE_SIZE="0",
+                   RANKING_CACHE_SIZE="0")
+        env.pop("RESULT_CACHE_PATH", None)
+        server = subprocess.Popen([sys.executable, "serve.py"], env=env,
+                                  stdout=subprocess.DEVNULL)
+        try:
+            wait_ready()
+            rps = measure_rps(2 * workers, seconds)
+            memory = [get_memory(pid) for pid in get_children(server.pid)]
+            rss = sum(rss for rss, _ in memory) / len(memory) / 1024
+            pss = sum(pss for _, pss in memory) / len(memory) / 1024
+            print("{:7d}  {:14.1f}  {:14.1f}  {:10.1f}".format(
+                workers, rss, pss, rps))
+        finally:
+            server.terminate()
+            server.wait()
@@ -1,4 +1,27 @@
+from multiprocessing import cpu_count
+import logging
+import os
+
+
 class Config:
     """This class is used to config server."""
-    
-    pass
+
+    BOOK_INDEX_DIR = os.environ.get("BOOK_INDEX_DIR", "books")
+    BIND = os.environ.get("BIND", "127.0.0.1:5000")
+    WORKERS = int(os.environ.get("WORKERS", cpu_count()))
+    WORKER_TIMEOUT = int(os.environ.get("WORKER_TIMEOUT", 60))
+    WARMUP_REQUEST = {"sentence": "maybe it's vice versa", "word": "vice",
+                      "word_order": 0}
+    MAX_CONCURRENT = int(os.environ.get("MAX_CONCURRENT", 2 * WORKERS))
+    MAX_PENDING = int(os.environ.get("MAX_PENDING", 100))
+    LOG_LEVEL = getattr(logging,
+                        os.environ.get("LOG_LEVEL", "WARNING").upper())
+    GRAPH_MAX_VERTEXES = int(os.environ.get("GRAPH_MAX_VERTEXES", 50000))
+    GRAPH_MAX_EDGES = int(os.environ.get("GRAPH_MAX_EDGES", 400000))
+    GRAPH_DEADLINE = float(os.environ.get("GRAPH_DEADLINE", 2.0))
+    RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH")
+    RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE",
+                                           64 * 1024 * 1024))
+    IDIOMS_CHECK_INTERVAL = float(os.environ.get("IDIOMS_CHECK_INTERVAL", 10))
+    ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+    METRICS_DIR = os.environ.get("METRICS_DIR")
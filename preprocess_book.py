@@ -0,0 +1,176 @@
+"""
+Precompute senses of every content token of book.
+
+Usage: python preprocess_book.py BOOK_FILE BOOK_ID [INDEX_DIR]
+
+Book is read line by line, chapter by chapter, so only one paragraph and
+one batch of sentences are kept in memory at once. Sentences of batch are
+tagged across Config.WORKERS processes. Senses are written to
+INDEX_DIR/BOOK_ID.sqlite3, which is used by server for lookups of that
+book.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import re
+import sys
+import nltk
+from config import Config
+from sentence_processing.auxiliar_functions import analyze_sents, get_tagger
+from sentence_processing.book_index import BookIndex, get_index_path
+from sentence_processing.definitions import get_targets_ranking
+from sentence_processing.idiom_processing import get_all_idioms_dict
+from sentence_processing.senses import get_senses
+
+CHAPTER_RE = re.compile(r"^\s*(chapter|part|book)"
+                        r"(\s+(\d+|[ivxlcdm]+|one|two|three|four|five|six|"
+                        r"seven|eight|nine|ten))?\s*[.:]?\s*$", re.IGNORECASE)
+MAX_PARAGRAPH = 64 * 1024
+BATCH_SIZE = 2048
+
+
+def read_paragraphs(book_file):
+    """
+    (file) -> iter.
+
+    Yield (chapter, paragraph) pairs of book. Paragraphs that are longer
+    than MAX_PARAGRAPH are split at sentence boundaries, or at spaces when
+    there are no boundaries.
+    """
+    chapter = 0
+    lines = []
+    size = 0
+    for line in book_file:
+        if CHAPTER_RE.match(line):
+            if lines:
+                yield chapter, " ".join(lines)
+            chapter += 1
+            lines, size = [], 0
+        elif not line.strip():
+            if lines:
+                yield chapter, " ".join(lines)
+            lines, size = [], 0
+        else:
+            lines.append(line.strip())
+            size += len(line)
+            if size > MAX_PARAGRAPH:
+                text = " ".join(lines)
+                sentences = nltk.sent_tokenize(text)
+                if len(sentences) > 1:
+                    yield chapter, " ".join(sentences[:-1])
+                    text = sentences[-1]
+                while len(text) > MAX_PARAGRAPH:
+                    cut = text.rfind(" ", 0, MAX_PARAGRAPH + 1)
+                    if cut <= 0:
+                        cut = MAX_PARAGRAPH
+                    yield chapter, text[:cut]
+                    text = text[cut:].strip()
+                lines = [text] if text else []
+                size = len(text)
+    if lines:
+        yield chapter, " ".join(lines)
+
+
+def read_batches(book_file, size=BATCH_SIZE):
+    """
+    (file, int) -> iter.
+
+    Yield lists of at most size (chapter, sentence) pairs of book.
+    """
+    batch = []
+    for chapter, paragraph in read_paragraphs(book_file):
+        for sentence in nltk.sent_tokenize(paragraph):
+            batch.append((chapter, sentence.lower().strip()))
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def get_content_targets(analysis):
+    """
+    (AnalyzedSentence) -> list.
+
+    Return (position, word, word_order) of all content tokens of sentence.
+    """
+    targets = []
+    orders = {}
+    for position, (token, stop) in enumerate(zip(analysis.tokens,
+                                                 analysis.stop_flags)):
+        word_order = orders.get(token, 0)
+        orders[token] = word_order + 1
+        if not stop and analysis.get_pos_wn(token, word_order):
+            targets.append((position, token, word_order))
+    return targets
+
+
+def index_sentence(book_index, idiom_dict, sentence_id, chapter, analysis):
+    """
+    (BookIndex, IdiomDict, int, int, AnalyzedSentence) -> int.
+
+    Add senses of all content tokens of analyzed sentence to index and
+    return their number.
+    """
+    book_index.add_sentence(sentence_id, chapter, analysis.sentence)
+    targets = get_content_targets(analysis)
+    if not targets:
+        return 0
+    possible_idioms = idiom_dict.find_idioms(analysis)
+    ranking = get_targets_ranking(
+        analysis, [(word, word_order) for _, word, word_order in targets])
+    for position, word, word_order in targets:
+        spans = [span for span in possible_idioms if position in span]
+        idiom_span = max(spans, key=len) if spans else None
+        senses = get_senses(analysis, word, word_order, idiom_dict,
+                            possible_idioms, ranking)
+        book_index.add_senses(sentence_id, position, word, word_order,
+                              idiom_span, senses)
+    return len(targets)
+
+
+def preprocess_book(book_path, book_id, index_dir=Config.BOOK_INDEX_DIR,
+                    processes=Config.WORKERS):
+    """
+    (str, str, str, int) -> int.
+
+    Write index of senses of book and return number of indexed tokens.
+    Sentences are tagged in batches across processes.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    path = get_index_path(index_dir, book_id)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    book_index = BookIndex(tmp_path)
+    idiom_dict = get_all_idioms_dict()
+    sentence_id = 0
+    tokens = 0
+    current_chapter = 0
+    pool = None
+    if processes > 1:
+        pool = ProcessPoolExecutor(processes, initializer=get_tagger)
+    try:
+        with open(book_path, encoding="utf-8") as book_file:
+            for batch in read_batches(book_file):
+                analyses = analyze_sents([sentence for _, sentence in batch],
+                                         pool)
+                for (chapter, _), analysis in zip(batch, analyses):
+                    if chapter != current_chapter:
+                        book_index.commit()
+                        current_chapter = chapter
+                    tokens += index_sentence(book_index, idiom_dict,
+                                             sentence_id, chapter, analysis)
+                    sentence_id += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    book_index.commit()
+    book_index.connection.close()
+    os.replace(tmp_path, path)
+    return tokens
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    print(preprocess_book(*sys.argv[1:4]), "tokens indexed")
@@ -1,10 +1,149 @@
-from nltk.stem import WordNetLemmatizer
 from nltk.corpus import wordnet as wn
-from nltk.corpus import stopwords
+from nltk.tag import PerceptronTagger
 from collections import defaultdict
 from string import punctuation
+from . import lemmatizer
+from .instrumentation import span
 import nltk
 
+TAG_CHUNK = 256
+
+_tagger = None
+
+
+class AnalyzedSentence:
+    """
+    Represents sentence that is tokenized, tagged and lemmatized once, so
+    that all stages of request share the same analysis.
+    """
+
+    def __init__(self, sentence, tagged=None):
+        """
+        Initialize analysis of sentence, which can be already tokenized and
+        tagged as list of (token, tag) pairs.
+        """
+        self.sentence = sentence
+        if tagged is None:
+            with span("tokenize_tag"):
+                tagged = get_pos_tokens_list(nltk.word_tokenize(sentence))
+        self.tokens = [token for token, _ in tagged]
+        self.tags = [tag for _, tag in tagged]
+        with span("lemmatize"):
+            english_stopwords = lemmatizer.get_stopwords()
+            self.stop_flags = [token in punctuation or
+                               token in english_stopwords
+                               for token in self.tokens]
+            tokens_dict = self.get_tokens_dict()
+            self.lemmas = []
+            for word in self.tokens:
+                self.lemmas.append(lemmatize(word, tokens_dict).strip("-–"))
+                del tokens_dict[word][0]
+        self._gap_counts = None
+
+    def __repr__(self):
+        """Represent analysis in repr form."""
+        return "<AnalyzedSentence: " + self.sentence + ">"
+
+    def get_gap_counts(self):
+        """
+        (self) -> list.
+
+        Return list, where item i is number of verbs and adverbs among
+        first i tokens of sentence, so that tokens from i to j - 1 have
+        counts[j] - counts[i] of them.
+        """
+        if self._gap_counts is None:
+            self._gap_counts = [0]
+            for tag in self.tags:
+                self._gap_counts.append(self._gap_counts[-1] +
+                                        (tag[:2] == "VB" or tag[0] == "R"))
+        return self._gap_counts
+
+    def get_tokens_dict(self):
+        """
+        (self) -> dict.
+
+        Return new dictionary, where key is word and value
+        is list with Part-Of-Speech tags, index of tag in list
+        is order of occurrence
+        """
+        tokens_dict = defaultdict(list)
+        for word, word_class in zip(self.tokens, self.tags):
+            tokens_dict[word].append(word_class)
+        return tokens_dict
+
+    def get_tag(self, word, order=0):
+        """
+        (self, str, int) -> str.
+
+        Return Part-Of-Speech tag of word that is in sentence in order.
+        """
+        return self.get_tokens_dict()[word][order]
+
+    def get_pos_wn(self, word, order=0):
+        """
+        (self, str, int) -> str.
+
+        Return part-of-speech of word in WordNet's representation.
+        """
+        return get_pos_wn(word, self.get_tokens_dict(), order)
+
+    def lemmatize_word(self, word, order):
+        """
+        (self, str, int) -> str.
+
+        Return lemmatized word.
+        """
+        return lemmatize(word, self.get_tokens_dict(), order)
+
+    def get_lemmas_set(self, word=None, word_order=0):
+        """
+        (self, str, int) -> set.
+
+        Return set of lemmas of words in this sentence.
+        """
+        tokens_dict = self.get_tokens_dict()
+        stop_tokens = set(token for token, stop in
+                          zip(self.tokens, self.stop_flags) if stop)
+        lemmas_set = set()
+
+        for token in tokens_dict.keys():
+            for order, pos in enumerate(tokens_dict[token]):
+                if token not in stop_tokens or token == word:
+                    lemma = lemmatize(token, tokens_dict, order)
+                    lemmas_set.add((lemma, get_pos_wn(token, tokens_dict,
+                                                      order)))
+
+        if word:
+            word_lemma = lemmatize(word, tokens_dict, word_order)
+            word_pos = get_pos_wn(word, tokens_dict, word_order)
+            return lemmas_set, (word_lemma, word_pos)
+        return lemmas_set
+
+
+def analyze(sentence):
+    """
+    (str) -> AnalyzedSentence.
+
+    Return analysis of sentence. Sentence that is already analyzed is
+    returned as it is.
+    """
+    if isinstance(sentence, AnalyzedSentence):
+        return sentence
+    return AnalyzedSentence(sentence)
+
+
+def analyze_sents(sentences, pool=None):
+    """
+    (list, Executor) -> list.
+
+    Return analyses of sentences that are tagged in batches, which are
+    spread across process pool if it is given.
+    """
+    tokenized_sens = [nltk.word_tokenize(sentence) for sentence in sentences]
+    return [AnalyzedSentence(sentence, tagged) for sentence, tagged in
+            zip(sentences, tag_sents(tokenized_sens, pool))]
+
 
 def get_pos_tokens_dict(sentence):
     """
@@ -28,7 +167,45 @@ def get_pos_tokens_list(tokenized_sen):
 
     Return list of part-of-speech tags for tokenized sentence.
     """
-    return nltk.pos_tag(tokenized_sen)
+    return get_tagger().tag(tokenized_sen)
+
+
+def get_tagger():
+    """
+    (None) -> PerceptronTagger.
+
+    Return part-of-speech tagger that is loaded once per process.
+    """
+    global _tagger
+    if _tagger is None:
+        _tagger = PerceptronTagger()
+    return _tagger
+
+
+def pos_tag_sents(tokenized_sens):
+    """
+    (list) -> list.
+
+    Return list of (token, tag) pairs for every tokenized sentence.
+    """
+    tagger = get_tagger()
+    return [tagger.tag(tokenized_sen) for tokenized_sen in tokenized_sens]
+
+
+def tag_sents(tokenized_sens, pool=None, chunk_size=TAG_CHUNK):
+    """
+    (list, Executor, int) -> list.
+
+    Return list of (token, tag) pairs for every tokenized sentence. Chunks
+    of chunk_size sentences are tagged in process pool if it is given,
+    which workers should be initialized with get_tagger.
+    """
+    if pool is None or len(tokenized_sens) <= chunk_size:
+        return pos_tag_sents(tokenized_sens)
+    chunks = [tokenized_sens[i:i + chunk_size]
+              for i in range(0, len(tokenized_sens), chunk_size)]
+    return [tagged for chunk in pool.map(pos_tag_sents, chunks)
+            for tagged in chunk]
 
 
 def get_lemmatized_sen(sentence):
@@ -37,13 +214,7 @@ def get_lemmatized_sen(sentence):
 
     Return list of lemmatized words of this sentence.
     """
-    tokenized_sen = nltk.word_tokenize(sentence)
-    tokens_dict = get_pos_tokens_dict(sentence)
-    lemmatized_sen = []
-    for word in tokenized_sen:
-        lemmatized_sen.append(lemmatize(word, tokens_dict).strip("-–"))
-        del tokens_dict[word][0]
-    return lemmatized_sen
+    return list(analyze(sentence).lemmas)
 
 
 def lemmatize_word(sentence, word, order):
@@ -52,8 +223,7 @@ def lemmatize_word(sentence, word, order):
 
     Return lemmatized word.
     """
-    tokens_dict = get_pos_tokens_dict(sentence)
-    return lemmatize(word, tokens_dict, order)
+    return analyze(sentence).lemmatize_word(word, order)
 
 
 def get_pos_wn(word, tokens_dict, order=0):
@@ -113,6 +283,21 @@ def oxf_2_wn(oxf_class):
     return oxf_2_wn[oxf_class]
 
 
+def get_form(word, tokens_dict, order=0):
+    """
+    (str, dict, int) -> tuple.
+
+    Return (word, part-of-speech, past) form of word that is in sentence in
+    order, which its lemma depends on. Past is True when word is tagged as
+    VB, VBD or VBN and None when there is no such order.
+    """
+    tags = tokens_dict[word]
+    past = None
+    if -len(tags) <= order < len(tags):
+        past = tags[order] in "VBD VBN"
+    return word, get_pos_wn(word, tokens_dict), past
+
+
 def lemmatize(word, tokens_dict, order=0):
     """
     (str, dict, int) -> str.
@@ -120,21 +305,7 @@ def lemmatize(word, tokens_dict, order=0):
     Return lemmatized word using dict of tokens and order of word in
     sentence.
     """
-    pos_tag = get_pos_wn(word, tokens_dict)
-    if pos_tag:
-        poss_lemm = wn._morphy(word, pos_tag)
-    else:
-        poss_lemm = ""
-    if len(poss_lemm) == 1:
-        return poss_lemm[0]
-    else:
-        if tokens_dict[word][order] in "VBD VBN":
-            for w in poss_lemm:
-                if w != word:
-                    return w
-    wordnet_lemmatizer = WordNetLemmatizer()
-    lemmatized = wordnet_lemmatizer.lemmatize(word)
-    return lemmatized
+    return lemmatizer.lemmatize(*get_form(word, tokens_dict, order))
 
 
 def get_sen_lemmas_set(sentence, word=None, word_order=0):
@@ -143,18 +314,4 @@ def get_sen_lemmas_set(sentence, word=None, word_order=0):
 
     Return set of lemmas of words in this sentence.
     """
-    tokens_dict = get_pos_tokens_dict(sentence)
-    lemmas_set = set()
-
-    for token in tokens_dict.keys():
-        for order, pos in enumerate(tokens_dict[token]):
-            if not (token in punctuation or (
-                    token in stopwords.words("english"))) or token == word:
-                lemma = lemmatize(token, tokens_dict, order)
-                lemmas_set.add((lemma, get_pos_wn(token, tokens_dict, order)))
-
-    if word:
-        word_lemma = lemmatize(word, tokens_dict, word_order)
-        word_pos = get_pos_wn(word, tokens_dict, word_order)
-        return lemmas_set, (word_lemma, word_pos)
-    return lemmas_set
+    return analyze(sentence).get_lemmas_set(word, word_order)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+BOOK_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+_indexes = {}
+
+
+def normalize_sentence(sentence):
+    """
+    (str) -> str.
+
+    Return sentence in the form that is used as key of index.
+    """
+    return " ".join(sentence.lower().split())
+
+
+def get_sentence_digest(sentence):
+    """
+    (str) -> str.
+
+    Return SHA-1 digest of normalized sentence.
+    """
+    return hashlib.sha1(
+        normalize_sentence(sentence).encode("utf-8")).hexdigest()
+
+
+def get_index_path(index_dir, book_id):
+    """
+    (str, str) -> str.
+
+    Return path of index of book with book_id.
+    """
+    if not BOOK_ID_RE.match(book_id):
+        raise ValueError("Invalid book id: " + book_id)
+    return os.path.join(index_dir, book_id + ".sqlite3")
+
+
+class BookIndex:
+    """
+    Represents index of precomputed senses of one book, where key is
+    sentence id and token position.
+    """
+
+    def __init__(self, path):
+        """Initialize index that is stored in SQLite file in path."""
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS sentences ("
+            " id INTEGER PRIMARY KEY, chapter INTEGER, digest TEXT);"
+            "CREATE INDEX IF NOT EXISTS sentences_digest"
+            " ON sentences (digest);"
+            "CREATE TABLE IF NOT EXISTS senses ("
+            " sentence_id INTEGER, position INTEGER, word TEXT,"
+            " word_order INTEGER, idiom_span TEXT, senses TEXT,"
+            " PRIMARY KEY (sentence_id, position));"
+            "CREATE INDEX IF NOT EXISTS senses_word"
+            " ON senses (sentence_id, word, word_order);")
+
+    def add_sentence(self, sentence_id, chapter, sentence):
+        """
+        (self, int, int, str) -> None.
+
+        Add sentence of chapter to index.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO sentences VALUES (?, ?, ?)",
+            (sentence_id, chapter, get_sentence_digest(sentence)))
+
+    def add_senses(self, sentence_id, position, word, word_order, idiom_span,
+                   senses):
+        """
+        (self, int, int, str, int, tuple, dict) -> None.
+
+        Add senses of token that is in sentence in position.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO senses VALUES (?, ?, ?, ?, ?, ?)",
+            (sentence_id, position, word, word_order,
+             json.dumps(idiom_span), json.dumps(senses)))
+
+    def commit(self):
+        """
+        (self) -> None.
+
+        Write added sentences and senses to file.
+        """
+        self.connection.commit()
+
+    def lookup(self, sentence, word, word_order):
+        """
+        (self, str, str, int) -> dict.
+
+        Return precomputed senses of word that is in sentence in word_order
+        or None if they are not in index.
+        """
+        row = self.connection.execute(
+            "SELECT senses.senses FROM sentences JOIN senses"
+            " ON senses.sentence_id = sentences.id"
+            " WHERE sentences.digest = ? AND senses.word = ?"
+            " AND senses.word_order = ? LIMIT 1",
+            (get_sentence_digest(sentence), word, word_order)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+
+def get_book_index(index_dir, book_id):
+    """
+    (str, str) -> BookIndex.
+
+    Return index of book with book_id or None if book is not indexed.
+    Indexes are opened once per process.
+    """
+    path = get_index_path(index_dir, book_id)
+    key = (os.getpid(), path)
+    if key not in _indexes:
+        if not os.path.exists(path):
+            return None
+        _indexes[key] = BookIndex(path)
+    return _indexes[key]
@@ -1,22 +1,130 @@
+from collections import OrderedDict
 from pprint import pprint
+from threading import Lock
+from nltk.corpus import wordnet as wn
+import logging
+import os
 from . import auxiliar_functions
 from . import graph_word_wsd
-import json
-import requests
+from . import instrumentation
+from . import lexicon
+from . import oxford
 
+RANKING_CACHE_SIZE = int(os.environ.get("RANKING_CACHE_SIZE", 32))
 
-def get_wn_definitions(sentence, word, word_order):
+logger = logging.getLogger(__name__)
+
+_rankings = OrderedDict()
+_rankings_lock = Lock()
+
+
+def hit_deadline(budget, stage):
+    """
+    (GraphBudget, str) -> bool.
+
+    Return True and count skipped stage if deadline of budget has passed.
+    """
+    if budget is None or not budget.expired():
+        return False
+    budget.hit = "deadline"
+    instrumentation.inc("deadline_hits_total", stage=stage)
+    return True
+
+
+def rank_sentence(lemmas_set, budget=None, targets=()):
+    """
+    (set, GraphBudget, set) -> tuple.
+
+    Return ranking of WordNet graph built from lemmas of sentence within
+    budget, where senses of lemmas from targets are expanded first, or None
+    if deadline of budget passes before graph is ranked. Lemmas_set should
+    not depend on targets, so that rankings of whole graphs, which are kept
+    for RANKING_CACHE_SIZE recent sentences, are reused by all targets of
+    sentence.
+    """
+    key = frozenset(lemmas_set)
+    with _rankings_lock:
+        if key in _rankings:
+            _rankings.move_to_end(key)
+            return _rankings[key]
+    if hit_deadline(budget, "graph_build"):
+        return None
+    graph = graph_word_wsd.build_word_graph(lemmas_set, None, budget=budget,
+                                            targets=targets)
+    if hit_deadline(budget, "pagerank"):
+        return None
+    ranking = graph_word_wsd.rank_graph(graph, personalization=graph.seeds)
+    if budget is None or budget.hit is None:
+        with _rankings_lock:
+            _rankings[key] = ranking
+            while len(_rankings) > RANKING_CACHE_SIZE:
+                _rankings.popitem(last=False)
+    return ranking
+
+
+def get_targets_ranking(sentence, targets, budget=None):
+    """
+    (str, list, GraphBudget) -> tuple.
+
+    Return ranking of one WordNet graph of sentence that is shared by all
+    targets, which are (word, word_order) pairs, or None if no target has
+    WordNet part-of-speech or deadline of budget has passed.
+    """
+    analysis = auxiliar_functions.analyze(sentence)
+    lemmas_set = analysis.get_lemmas_set()
+    start_words = set(get_start_word(analysis, word, word_order)
+                      for word, word_order in targets
+                      if analysis.get_pos_wn(word, word_order))
+    if not lemmas_set or not start_words:
+        return None
+    return rank_sentence(lemmas_set, budget, start_words)
+
+
+def get_start_word(analysis, word, word_order):
     """
-    (str, str, int) -> str, str, list.
+    (AnalyzedSentence, str, int) -> tuple.
+
+    Return (lemma, part-of-speech) of word that is in analyzed sentence in
+    word_order.
+    """
+    return (analysis.lemmatize_word(word, word_order),
+            analysis.get_pos_wn(word, word_order))
+
+
+def get_first_synsets(start_word, number=3):
+    """
+    (tuple, int) -> list.
+
+    Return first WordNet synsets of start_word in order of their frequency
+    in WordNet, which needs no graph.
+    """
+    return wn.synsets(start_word[0], start_word[1])[:number]
+
+
+def get_wn_definitions(sentence, word, word_order, ranking=None,
+                       budget=None, fast=False):
+    """
+    (str, str, int, tuple, GraphBudget, bool) -> str, str, list.
 
     Return word in first form, part-of-speech and definitions with examples
-    from word that is in sentence in word_order.
+    from word that is in sentence in word_order. Sentence can be already
+    analyzed and ranking of its graph can be already computed, otherwise
+    graph is built within budget from lemmas of sentence without stopwords,
+    which is the same for all words of sentence. First senses of WordNet
+    are returned when fast is True, deadline of budget passes before graph
+    is ranked or senses of word are not in graph.
     """
-    lemmas_set, start_word = auxiliar_functions.get_sen_lemmas_set(sentence,
-            word, word_order)
-    print(lemmas_set, start_word)
-    graph = graph_word_wsd.build_word_graph(lemmas_set, start_word)
-    synsets = graph_word_wsd.get_top_synsets(graph, start_word)
+    analysis = auxiliar_functions.analyze(sentence)
+    lemmas_set = analysis.get_lemmas_set()
+    start_word = get_start_word(analysis, word, word_order)
+    logger.debug("lemmas %s, start word %s", lemmas_set, start_word)
+    if ranking is None and not fast and lemmas_set:
+        ranking = rank_sentence(lemmas_set, budget, {start_word})
+    synsets = []
+    if ranking is not None:
+        synsets = graph_word_wsd.get_ranked_synsets(ranking, start_word)
+    if not synsets:
+        synsets = get_first_synsets(start_word)
     word_definitions = []
     for synset in synsets:
         word_definitions.append({
@@ -30,46 +138,52 @@ def get_wn_definitions(sentence, word, word_order):
         word_definitions
 
 
-def get_oxf_definitions(word, word_pos):
+def get_oxf_definitions(word, word_pos, remote=True):
     """
-    (str, str) -> str, str, list.
+    (str, str, bool) -> str, str, list.
 
     Return word, part-of-speech and defitions of word that is part-of-speech.
+    Only cached definitions are returned when remote is False.
+    """
+    word_definitions = oxford.lookup(word, word_pos, remote)
+    return word, auxiliar_functions.wn_2_oxf(word_pos), word_definitions
+
+
+def get_lexicon_definitions(word, word_pos):
+    """
+    (str, str) -> str, str, list.
+
+    Return word, part-of-speech and defitions of closed-class word from
+    bundled lexicon or None if word is not in lexicon.
     """
-    app_id = '0dd8f390'
-    app_key = '1671423a9398f671e334350676749918'
-    url = "https://od-api.oxforddictionaries.com:443/api/v1/entries/en/" + word
-    ret = requests.get(url, headers={"app_id": app_id, "app_key": app_key})
-    word_definitions = list()
-    for lexical_category in json.loads(ret.text)["results"][0][
-            "lexicalEntries"]:
-        for definition in lexical_category["entries"][0]["senses"]:
-            try:
-                wn_lexical_cat = auxiliar_functions.oxf_2_wn(
-                    lexical_category["lexicalCategory"])
-                if wn_lexical_cat == word_pos:
-                    word_definitions.append({
-                        "definition": definition["definitions"][0],
-                        "example": definition["examples"][0]["text"]
-                    })
-            except KeyError:
-                pass
+    word_definitions = lexicon.lookup(word, word_pos)
+    if word_definitions is None:
+        return None
     return word, auxiliar_functions.wn_2_oxf(word_pos), word_definitions
 
 
-def get_definitions(sentence, word, word_order):
+def get_definitions(sentence, word, word_order, ranking=None, budget=None,
+                    fast=False):
     """
-    (str, str, int) -> list.
+    (str, str, int, tuple, GraphBudget, bool) -> list.
 
-    Return list of senses of word in sentence that is in word_order
+    Return list of senses of word in sentence that is in word_order.
+    Sentence can be already analyzed and ranking of its WordNet graph can be
+    already computed, otherwise graph is built within budget. When fast is
+    True or deadline of budget has passed, WordNet graph is not ranked and
+    Oxford API is not requested.
     """
     senses = []
-    tokens_dict = auxiliar_functions.get_pos_tokens_dict(sentence)
-    start_word = auxiliar_functions.get_pos_wn(word, tokens_dict, word_order)
+    analysis = auxiliar_functions.analyze(sentence)
+    start_word = analysis.get_pos_wn(word, word_order)
     if(start_word):
-        senses.extend(get_wn_definitions(sentence, word, word_order))
+        senses.extend(get_wn_definitions(analysis, word, word_order,
+                                         ranking, budget, fast))
     else:
-        senses.extend(get_oxf_definitions(word, tokens_dict[word][word_order]))
+        word_pos = analysis.get_tag(word, word_order)
+        senses.extend(get_lexicon_definitions(word, word_pos) or
+                      get_oxf_definitions(word, word_pos, not fast and
+                                          not hit_deadline(budget, "oxford")))
     return senses
 
 
@@ -1,14 +1,81 @@
+from array import array
+from time import monotonic
 from nltk.corpus import wordnet as wn
+from . import instrumentation
+from . import wordnet_relations
+import logging
+import numpy as np
+
+DAMPING = 0.15
+ITERATIONS = 20
+COMPACT_SIZE = 1 << 16
+MAX_DEPTH = 3
+BUDGET_CHUNK = 256
+MIN_RANKED_SIZE = 32
+
+logger = logging.getLogger(__name__)
+
+
+class GraphBudget:
+    """
+    Represents limits of graph that is built for one request. Deadline is
+    value of time.monotonic, after which expansion of graph stops, hit is
+    name of the first limit that was reached.
+    """
+
+    def __init__(self, max_vertexes=None, max_edges=None, deadline=None):
+        """Initialize budget, None means that there is no limit."""
+        self.max_vertexes = max_vertexes
+        self.max_edges = max_edges
+        self.deadline = deadline
+        self.hit = None
+
+    def expired(self):
+        """
+        (self) -> bool.
+
+        Return True if deadline has passed.
+        """
+        return self.deadline is not None and monotonic() >= self.deadline
 
 
 class Graph:
-    """Represents graph as data structure."""
+    """
+    Represents graph as data structure.
+
+    Vertexes are interned to integer ids in order of addition and edges are
+    kept as pairs of ids in flat arrays. Repeated edges are dropped when
+    arrays grow twice as large as the last compacted edge list.
+    """
+
+    __slots__ = ("ids", "vertexes", "sources", "targets", "leng", "seeds",
+                 "_limit")
 
     def __init__(self):
         """Initialize empty graph."""
-        self.edges = {}
-        self.leng = {}
-        self.num = {}
+        self.ids = {}
+        self.vertexes = []
+        self.sources = array("q")
+        self.targets = array("q")
+        self.leng = array("q")
+        self.seeds = set()
+        self._limit = COMPACT_SIZE
+
+    def __len__(self):
+        """
+        (self) -> int.
+
+        Return number of vertexes in graph.
+        """
+        return len(self.vertexes)
+
+    def __contains__(self, word):
+        """
+        (self, str) -> bool.
+
+        Return True if word is vertex of graph.
+        """
+        return word in self.ids
 
     def add_vertex(self, word):
         """
@@ -16,8 +83,9 @@ class Graph:
 
         Add vertex to graph with word as data.
         """
-        if word not in self.edges:
-            self.edges[word] = set()
+        if word not in self.ids:
+            self.ids[word] = len(self.vertexes)
+            self.vertexes.append(word)
 
     def add_edge(self, word1, word2):
         """
@@ -25,17 +93,20 @@ class Graph:
 
         Make edge between two vertexes.
         """
-        self.edges[word1].add(word2)
-        self.edges[word2].add(word1)
+        self.sources.append(self.ids[word1])
+        self.targets.append(self.ids[word2])
+        if len(self.sources) >= self._limit:
+            self._compact()
 
     def count_len(self):
         """
         (self) -> None.
 
-        Count number of edges in all vertexesself.
+        Count number of edges in all vertexes, leng[i] is degree of vertex
+        with id i.
         """
-        for vertex in self.edges.keys():
-            self.leng[vertex] = len(self.edges[vertex])
+        _, indptr, _ = self.to_csr()
+        self.leng = array("q", np.diff(indptr).tobytes())
 
     def merge(self, another_graph):
         """
@@ -43,103 +114,400 @@ class Graph:
 
         Merge two graphes.
         """
-        for edge in another_graph.edges:
-            try:
-                self.edges[edge].update(another_graph.edges[edge])
-            except KeyError:
-                self.edges[edge] = another_graph.edges[edge]
+        for vertex in another_graph.vertexes:
+            self.add_vertex(vertex)
+        ids = np.fromiter((self.ids[vertex] for vertex in
+                           another_graph.vertexes), dtype=np.int64,
+                          count=len(another_graph))
+        for edges, another_edges in ((self.sources, another_graph.sources),
+                                     (self.targets, another_graph.targets)):
+            if another_edges:
+                edges.frombytes(ids[np.frombuffer(another_edges,
+                                                  dtype=np.int64)].tobytes())
+        self.seeds.update(another_graph.seeds)
+        if len(self.sources) >= self._limit:
+            self._compact()
 
-    def count_num(self, lst):
+    def add_edges(self, words1, words2):
         """
-        (self, list) -> None.
+        (self, iterable, iterable) -> None.
 
-        Place all vertexes in some order.
+        Make edges between pairs of vertexes from words1 and words2, adding
+        vertexes that are not in graph yet.
         """
-        for number, vertex in enumerate(lst):
-            self.num[vertex] = number
+        words1, words2 = list(words1), list(words2)
+        for word in words1 + words2:
+            if word not in self.ids:
+                self.ids[word] = len(self.vertexes)
+                self.vertexes.append(word)
+        for edges, words in ((self.sources, words1), (self.targets, words2)):
+            edges.extend(self.ids[word] for word in words)
+        if len(self.sources) >= self._limit:
+            self._compact()
 
+    def neighbours(self, word):
+        """
+        (self, str) -> set.
 
-def get_similar(synset):
+        Return set of vertexes that are connected with word.
+        """
+        vertex = self.ids[word]
+        sources = np.frombuffer(self.sources, dtype=np.int64)
+        targets = np.frombuffer(self.targets, dtype=np.int64)
+        ids = np.union1d(targets[sources == vertex],
+                         sources[targets == vertex])
+        return set(self.vertexes[i] for i in ids)
+
+    def _get_edge_keys(self):
+        """
+        (self) -> ndarray.
+
+        Return sorted unique keys of undirected edges, where edge between
+        ids a <= b has key a * len(self) + b.
+        """
+        sources = np.frombuffer(self.sources, dtype=np.int64)
+        targets = np.frombuffer(self.targets, dtype=np.int64)
+        return np.unique(np.minimum(sources, targets) * len(self) +
+                         np.maximum(sources, targets))
+
+    def _compact(self):
+        """
+        (self) -> None.
+
+        Drop repeated edges from arrays of edges.
+        """
+        keys = self._get_edge_keys()
+        self.sources = array("q", (keys // len(self)).tobytes())
+        self.targets = array("q", (keys % len(self)).tobytes())
+        self._limit = max(2 * len(keys), COMPACT_SIZE)
+
+    def to_csr(self):
+        """
+        (self) -> list, ndarray, ndarray.
+
+        Return vertexes of graph and its adjacency in CSR form, where
+        neighbours of vertex i are indices[indptr[i]:indptr[i + 1]].
+        """
+        size = len(self)
+        keys = self._get_edge_keys()
+        sources, targets = keys // size, keys % size
+        loops = sources == targets
+        rows = np.concatenate((sources, targets[~loops]))
+        columns = np.concatenate((targets, sources[~loops]))
+        order = np.lexsort((columns, rows))
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+        return self.vertexes, indptr, columns[order]
+
+
+def csr_pagerank(indptr, indices, personalization=None, tol=1e-6,
+                 max_iter=100, start=None):
     """
-    (synset) -> set.
+    (ndarray, ndarray, ndarray, float, int, ndarray) -> ndarray, int.
 
-    Return set with all synsets that are similar to this synset.
+    Return PageRank of vertexes of graph in CSR form and number of made
+    iterations. Iterations stop when L1 change of ranks is less than tol.
+    Personalization is distribution of random jumps, uniform by default.
+    Iterations start from ranks in start, uniform by default.
     """
-    if isinstance(synset, int):
-        return None
-    similar_words = set()
-    similar_words.update(synset.member_holonyms())
-    similar_words.update(synset.member_meronyms())
-    similar_words.update(synset.hypernyms())
-    similar_words.update(synset.hyponyms())
-    similar_words.update(synset.part_holonyms())
-    similar_words.update(synset.part_meronyms())
-    return similar_words
+    size = len(indptr) - 1
+    degrees = np.diff(indptr)
+    rows = np.repeat(np.arange(size), degrees)
+    inv_degrees = np.zeros(size)
+    np.divide(1.0, degrees, out=inv_degrees, where=degrees > 0)
+    if personalization is None or not personalization.sum():
+        personalization = np.full(size, 1 / size)
+    else:
+        personalization = personalization / personalization.sum()
+    teleport = (1 - DAMPING) * personalization
+    if start is None or not start.sum():
+        ranks = np.full(size, 1 / size)
+    else:
+        ranks = start / start.sum()
+    for iteration in range(1, max_iter + 1):
+        contributions = (ranks * inv_degrees)[indices]
+        new_ranks = teleport + DAMPING * np.bincount(
+            rows, weights=contributions, minlength=size)
+        delta = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if delta < tol:
+            break
+    return ranks, iteration
 
 
 def add_similar(graph, synset, depth=0):
     """
-    (Graph, synset, int) -> None.
+    (Graph, int, int) -> None.
+
+    Add similar synsets to graph, where synset is number of synset in
+    table of WordNet relations.
+    """
+    add_similar_many(graph, [synset], depth)
+
+
+def add_similar_many(graph, synsets, depth=0):
+    """
+    (Graph, list, int) -> None.
 
-    Add similar synsets to graph.
+    Add similar synsets of all synsets to graph. Synsets that are at most
+    MAX_DEPTH - depth relations away from one of synsets are added with all
+    their relations.
     """
-    for word in get_similar(synset):
-        graph.add_vertex(word)
-        graph.add_edge(synset, word)
-        if depth < 3:
-            add_similar(graph, word, depth + 1)
+    table = wordnet_relations.get_table()
+    expanded = np.unique(np.concatenate(
+        [table.expand(synset, max(MAX_DEPTH - depth, 0))
+         for synset in synsets]))
+    sources, targets = table.get_edges(expanded)
+    graph.add_edges(sources.tolist(), targets.tolist())
 
 
-def build_word_graph(lemmas_set, start_word, root=False, depth=0):
+def add_within_budget(graph, synsets, budget):
     """
-    (set, str, bool, int) -> Graph.
+    (Graph, ndarray, GraphBudget) -> bool.
+
+    Add relations of synsets to graph in their order while graph stays
+    within budget. Return False and record hit limit in budget when not
+    all synsets were added.
+    """
+    table = wordnet_relations.get_table()
+    max_vertexes = budget.max_vertexes or float("inf")
+    max_edges = budget.max_edges or float("inf")
+    for start in range(0, len(synsets), BUDGET_CHUNK):
+        if budget.expired():
+            budget.hit = "deadline"
+            return False
+        chunk = synsets[start:start + BUDGET_CHUNK]
+        sources, targets = table.get_edges(chunk)
+        lengths = table.indptr[chunk + 1] - table.indptr[chunk]
+        unique, first = np.unique(targets, return_index=True)
+        is_new = np.zeros(len(targets))
+        is_new[first[np.fromiter((target not in graph for target in
+                                  unique.tolist()),
+                                 dtype=bool, count=len(unique))]] = 1
+        vertexes = len(graph) + np.cumsum(np.bincount(
+            np.repeat(np.arange(len(chunk)), lengths), weights=is_new,
+            minlength=len(chunk)))
+        edges = len(graph.sources) + np.cumsum(lengths)
+        fit = int(np.count_nonzero((vertexes <= max_vertexes) &
+                                   (edges <= max_edges)))
+        end = int(lengths[:fit].sum())
+        graph.add_edges(sources[:end].tolist(), targets[:end].tolist())
+        if fit < len(chunk):
+            budget.hit = "vertexes" if vertexes[fit] > max_vertexes \
+                else "edges"
+            return False
+    return True
+
+
+def expand_within_budget(graph, groups, depth, budget):
+    """
+    (Graph, list, int, GraphBudget) -> None.
+
+    Add similar synsets of groups of synsets to graph breadth-first while
+    graph stays within budget. Synsets of every level are added group by
+    group, so earlier groups and nearer synsets are kept when budget is
+    hit.
+    """
+    table = wordnet_relations.get_table()
+    visited = np.zeros(len(table), dtype=bool)
+    frontiers = []
+    for group in groups:
+        frontier = np.unique(np.array(group, dtype=np.int64))
+        frontier = frontier[~visited[frontier]]
+        visited[frontier] = True
+        frontiers.append(frontier)
+    for level in range(max(MAX_DEPTH - depth, 0) + 1):
+        if level:
+            for i, frontier in enumerate(frontiers):
+                frontier = np.unique(table.neighbours(frontier))
+                frontiers[i] = frontier[~visited[frontier]]
+                visited[frontiers[i]] = True
+        for frontier in frontiers:
+            if not add_within_budget(graph, frontier, budget):
+                logger.debug("graph budget hit: %s", budget.hit)
+                return
+
+
+def build_word_graph(lemmas_set, start_word, root=False, depth=0,
+                     budget=None, targets=(), graph=None):
+    """
+    (set, str, bool, int, GraphBudget, set, Graph) -> Graph.
 
     Return graph with words from lemmas_set where start_word will be root.
+    Synsets are represented by their numbers in table of WordNet relations.
+    When budget is given, graph is expanded breadth-first until one of its
+    limits is hit, starting from senses of lemmas from targets. Words are
+    added to graph when it is given instead of new one.
     """
-    graph = Graph()
-    if root:
-        graph.add_vertex(start_word)
-    for word_lemma, word_pos in lemmas_set:
-        start_words = wn.synsets(word_lemma, pos=word_pos)
-        if not start_words:
-            continue
-        graph.add_vertex(start_words[0])
+    table = wordnet_relations.get_table()
+    if graph is None:
+        graph = Graph()
+    groups = ([], [])
+    with instrumentation.span("graph_build"):
         if root:
-            graph.add_edge(start_word, start_words[0])
-        for word in start_words:
-            graph.add_vertex(word)
-            graph.add_edge(start_words[0], word)
-            add_similar(graph, word, depth)
+            graph.add_vertex(start_word)
+        for word_lemma, word_pos in lemmas_set:
+            start_words = [table.index_of(synset) for synset in
+                           wn.synsets(word_lemma, pos=word_pos)]
+            if not start_words:
+                continue
+            graph.add_vertex(start_words[0])
+            if root:
+                graph.add_edge(start_word, start_words[0])
+            for word in start_words:
+                graph.add_vertex(word)
+                graph.add_edge(start_words[0], word)
+            if budget is None:
+                add_similar_many(graph, start_words, depth)
+            else:
+                groups[(word_lemma, word_pos) not in targets].extend(
+                    start_words)
+            graph.seeds.update(start_words)
+        if budget is not None:
+            expand_within_budget(graph, groups, depth, budget)
     return graph
 
 
-def get_top_synsets(graph, start_word, root=False, number=3):
+def observe_graph(graph_vertexes, indptr, indices):
     """
-    (Graph, tuple, bool, int) -> list.
+    (list, ndarray, ndarray) -> None.
 
-    Return top synsets in graph which are sorted by PageRank algorithm,
-    where start_word is root
+    Add number of vertexes and edges of graph in CSR form to histograms.
+    """
+    rows = np.repeat(np.arange(len(graph_vertexes)), np.diff(indptr))
+    edges = (len(indices) + int(np.count_nonzero(rows == indices))) // 2
+    instrumentation.observe("graph_vertexes", len(graph_vertexes))
+    instrumentation.observe("graph_edges", edges)
+    logger.debug("graph of %d vertexes and %d edges", len(graph_vertexes),
+                 edges)
+
+
+def get_python_pagerank(graph):
+    """
+    (Graph) -> list, list.
+
+    Return vertexes of graph and their PageRank computed in place with
+    ITERATIONS passes over graph.
     """
     graph.count_len()
-    graph_vertexes = list(graph.edges.keys())
-    graph.count_num(graph_vertexes)
-    N = len(graph.edges)
+    graph_vertexes, indptr, indices = graph.to_csr()
+    edges = [indices[indptr[i]:indptr[i + 1]].tolist()
+             for i in range(len(graph_vertexes))]
+    N = len(graph_vertexes)
     pagerank = [1 / N for i in range(N)]
 
-    for _ in range(20):
-        for i, vertex in enumerate(graph_vertexes):
-            pagerank[i] = 0.85 / N + 0.15 * sum([pagerank[graph.num[j]] /
-                    graph.leng[j] for j in graph.edges[vertex]])
-    possible_explanation = []
-    if root:
-        senses = graph.edges[start_word]
-    else:
-        senses = wn.synsets(start_word[0], start_word[1])
-    print(senses)
+    for _ in range(ITERATIONS):
+        for i in range(N):
+            pagerank[i] = 0.85 / N + 0.15 * sum([pagerank[j] /
+                    graph.leng[j] for j in edges[i]])
+    return graph_vertexes, pagerank
+
 
-    for i in range(N):
+def get_prior(graph_vertexes):
+    """
+    (list) -> ndarray, bool.
+
+    Return PageRank of vertexes of graph in graph of all WordNet relations
+    normalized to sum one and True if all vertexes are synsets. Vertexes
+    that are not synsets get mean rank of synsets.
+    """
+    table = wordnet_relations.get_table()
+    is_synset = np.fromiter((isinstance(vertex, int)
+                             for vertex in graph_vertexes),
+                            dtype=bool, count=len(graph_vertexes))
+    prior = np.ones(len(graph_vertexes))
+    if is_synset.any():
+        synsets = np.array([vertex for vertex in graph_vertexes
+                            if isinstance(vertex, int)], dtype=np.int64)
+        prior[is_synset] = table.prior[synsets]
+        prior[~is_synset] = prior[is_synset].mean()
+    if len(prior):
+        prior /= prior.sum()
+    return prior, bool(is_synset.all())
+
+
+def rank_graph(graph, engine="csr", personalization=None, tol=1e-6,
+               max_iter=100):
+    """
+    (Graph, str, set, float, int) -> list, list.
+
+    Return vertexes of graph and their PageRank. Engine "csr" ranks
+    vertexes with vectorized power iteration, where random jumps go to
+    vertexes from personalization if it is given, starting from their
+    global PageRank. Graph of synsets that has less than MIN_RANKED_SIZE
+    vertexes is not iterated, its ranks are random jumps blended with
+    global PageRank the same way as in one step of iteration. Engine
+    "python" keeps previous in place iterations and ignores
+    personalization, tol and max_iter.
+    """
+    if engine == "python":
+        with instrumentation.span("pagerank"):
+            ranking = get_python_pagerank(graph)
+        instrumentation.observe("pagerank_iterations", ITERATIONS)
+        return ranking
+    with instrumentation.span("pagerank"):
+        graph_vertexes, indptr, indices = graph.to_csr()
+        prior, synsets_only = get_prior(graph_vertexes)
+        jumps = None
+        if personalization:
+            jumps = np.fromiter((vertex in personalization
+                                 for vertex in graph_vertexes),
+                                dtype=np.float64, count=len(graph_vertexes))
+        if synsets_only and len(graph_vertexes) < MIN_RANKED_SIZE:
+            pagerank, iterations = prior, 0
+            if jumps is not None and jumps.sum():
+                pagerank = (1 - DAMPING) * jumps / jumps.sum() + \
+                    DAMPING * prior
+        else:
+            pagerank, iterations = csr_pagerank(indptr, indices, jumps, tol,
+                                                max_iter, prior)
+    observe_graph(graph_vertexes, indptr, indices)
+    instrumentation.observe("pagerank_iterations", iterations)
+    return graph_vertexes, pagerank
+
+
+def get_top_senses(ranking, senses, number=3):
+    """
+    (tuple, set, int) -> list.
+
+    Return vertexes from senses which are sorted by PageRank from ranking
+    of graph.
+    """
+    graph_vertexes, pagerank = ranking
+    logger.debug("senses %s", senses)
+    possible_explanation = []
+    for i in range(len(graph_vertexes)):
         if graph_vertexes[i] in senses:
-            print(graph_vertexes[i], pagerank[i])
+            logger.debug("%s %s", graph_vertexes[i], pagerank[i])
             possible_explanation.append((pagerank[i], graph_vertexes[i]))
 
     return list(map(lambda x: x[1], sorted(possible_explanation)[:number]))
+
+
+def get_ranked_synsets(ranking, start_word, number=3):
+    """
+    (tuple, tuple, int) -> list.
+
+    Return top WordNet synsets of start_word by ranking of graph.
+    """
+    table = wordnet_relations.get_table()
+    senses = set(table.index_of(synset) for synset in
+                 wn.synsets(start_word[0], start_word[1]))
+    return [table.synset_of(synset) for synset in
+            get_top_senses(ranking, senses, number)]
+
+
+def get_top_synsets(graph, start_word, root=False, number=3, engine="csr",
+                    personalization=None, tol=1e-6, max_iter=100):
+    """
+    (Graph, tuple, bool, int, str, set, float, int) -> list.
+
+    Return top synsets in graph which are sorted by PageRank algorithm,
+    where start_word is root. Synsets are returned as vertexes in root mode
+    and as WordNet synsets otherwise. Ranking arguments are the same as
+    of rank_graph.
+    """
+    ranking = rank_graph(graph, engine, personalization, tol, max_iter)
+    if root:
+        return get_top_senses(ranking, graph.neighbours(start_word), number)
+    return get_ranked_synsets(ranking, start_word, number)
@@ -0,0 +1,322 @@
+from array import array
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import re
+import sys
+from . import auxiliar_functions as af
+
+INDEX_VERSION = 3
+IDIOMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "expressions.json")
+READ_SIZE = 1 << 16
+WHITESPACE = re.compile(r"\s*")
+
+logger = logging.getLogger(__name__)
+REPLACING_WORDS = frozenset(["you", "your", "someone", "something",
+                             "somebody"])
+INSEPARABLE_KINDS = ("inseparable", "intransitive")
+SEPARABLE_KINDS = ("separable [optional]", "separable [obligatory]")
+
+
+class LemmaIndex:
+    """
+    Represents inverted index from lemma to numbers of idioms that require
+    it. Idiom can be in sentence only if all its required lemmas are there,
+    words from REPLACING_WORDS after the first one match any lemma.
+    """
+
+    def __init__(self, postings, required, wildcards):
+        """
+        Initialize index with postings of lemmas, number of required lemmas
+        of every idiom and numbers of idioms with wildcards.
+        """
+        self.postings = postings
+        self.required = required
+        self.wildcards = frozenset(wildcards)
+
+    def get_candidates(self, sen_lemmas, lemma=None):
+        """
+        (self, iterable, str) -> list.
+
+        Return sorted numbers of idioms whose required lemmas are all in
+        sen_lemmas. When lemma is given, only idioms that can have it are
+        returned.
+        """
+        counts = defaultdict(int)
+        for sen_lemma in set(sen_lemmas):
+            for number in self.postings.get(sen_lemma, ()):
+                counts[number] += 1
+        with_lemma = None
+        if lemma is not None:
+            with_lemma = self.wildcards.union(self.postings.get(lemma, ()))
+        return sorted(number for number, count in counts.items()
+                      if count == self.required[number] and
+                      (with_lemma is None or number in with_lemma))
+
+    def to_dict(self):
+        """
+        (self) -> dict.
+
+        Return index in the form that is saved to file.
+        """
+        return {"postings": self.postings, "required": self.required,
+                "wildcards": sorted(self.wildcards)}
+
+
+class StringTable:
+    """
+    Represents strings that are stored one after another in UTF-8 file,
+    where string i is bytes from offsets[i] to offsets[i + 1]. File is
+    memory-mapped, so strings stay on disk until they are read and pages of
+    file are shared by all processes.
+    """
+
+    def __init__(self, path, offsets):
+        """Initialize table with path of file and offsets of strings."""
+        self.path = path
+        self.offsets = offsets
+        self._map = None
+        if offsets[-1]:
+            with open(path, "rb") as strings_file:
+                self._map = mmap.mmap(strings_file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        """
+        (self) -> int.
+
+        Return number of strings in table.
+        """
+        return len(self.offsets) - 1
+
+    def __getitem__(self, number):
+        """
+        (self, int) -> str.
+
+        Return string with number from file.
+        """
+        start, end = self.offsets[number], self.offsets[number + 1]
+        if start == end:
+            return ""
+        return self._map[start:end].decode("utf-8")
+
+
+def get_required_lemmas(lemmatized, kind):
+    """
+    (list, str) -> set.
+
+    Return lemmas that sentence must have to contain idiom of kind. Idioms
+    of unknown kinds are never found, so they need no lemmas.
+    """
+    if kind == "separable [obligatory]":
+        return set(lemmatized)
+    if kind in INSEPARABLE_KINDS or kind == "separable [optional]":
+        return set(lemmatized[:1]).union(
+            lemma for lemma in lemmatized[1:] if lemma not in REPLACING_WORDS)
+    return set()
+
+
+def build_lemma_index(idioms):
+    """
+    (iterable) -> LemmaIndex.
+
+    Return inverted index of idioms, which are (lemmatized, kind) pairs
+    numbered in their order.
+    """
+    postings = defaultdict(list)
+    required = []
+    wildcards = []
+    for number, (lemmatized, kind) in enumerate(idioms):
+        lemmas = get_required_lemmas(lemmatized, kind)
+        for lemma in lemmas:
+            postings[lemma].append(number)
+        required.append(len(lemmas))
+        if lemmas and kind != "separable [obligatory]" and \
+                any(lemma in REPLACING_WORDS for lemma in lemmatized[1:]):
+            wildcards.append(number)
+    return LemmaIndex({lemma: tuple(numbers) for lemma, numbers in
+                       postings.items()}, required, wildcards)
+
+
+def source_digest(source_path):
+    """
+    (str) -> str.
+
+    Return SHA-1 digest of the idioms source file.
+    """
+    digest = hashlib.sha1()
+    with open(source_path, "rb") as source:
+        for chunk in iter(lambda: source.read(READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_json_array(json_file, read_size=READ_SIZE):
+    """
+    (file, int) -> iter.
+
+    Yield items of JSON array from file that is read by read_size
+    characters, so that whole file is never kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    separated = True
+    empty = True
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer and not started:
+            if buffer[0] != "[":
+                raise ValueError("JSON array is expected in " +
+                                 json_file.name)
+            buffer, started = buffer[1:], True
+            continue
+        if buffer[:1] == "]":
+            if separated and not empty:
+                raise ValueError("JSON array is malformed in " +
+                                 json_file.name)
+            return
+        if buffer[:1] == "," and not separated:
+            buffer, separated = buffer[1:], True
+            continue
+        end = None
+        if buffer and separated:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                pass
+        if end is not None:
+            after = WHITESPACE.match(buffer, end).end()
+            if buffer[after:after + 1] in (",", "]"):
+                yield item
+                buffer, separated, empty = buffer[after:], False, False
+                continue
+        if eof or (buffer and not separated):
+            raise ValueError("JSON array is malformed in " + json_file.name)
+        chunk = json_file.read(read_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def get_index_path(source_path):
+    """
+    (str) -> str.
+
+    Return path of the precompiled index that belongs to source file.
+    """
+    return os.path.splitext(source_path)[0] + ".idx"
+
+
+def get_strings_path(index_path):
+    """
+    (str) -> str.
+
+    Return path of the string table that belongs to precompiled index.
+    """
+    return os.path.splitext(index_path)[0] + ".strings"
+
+
+def build_index(source_path=IDIOMS_PATH, index_path=None, processes=1,
+                lemmas=None):
+    """
+    (str, str, int, dict) -> list, LemmaIndex, StringTable.
+
+    Lemmatize all idioms from source file, write them to the binary index
+    and return list of (name, lemmatized, kind) entries with inverted index
+    of their lemmas and table of their strings, where definition and
+    example of idiom i are strings 2 * i and 2 * i + 1. Names of idioms are
+    tagged in batches across processes, except names that are in lemmas,
+    where key is name and value is its lemmatized tuple from previous build.
+    """
+    if index_path is None:
+        index_path = get_index_path(source_path)
+    if lemmas is None:
+        lemmas = {}
+    strings_path = get_strings_path(index_path)
+    tmp_suffix = ".{}.tmp".format(os.getpid())
+    digest = source_digest(source_path)
+    names, kinds = [], []
+    offsets = array("q", [0])
+    try:
+        with open(source_path, encoding="utf-8") as source, \
+                open(strings_path + tmp_suffix, "wb") as strings_file:
+            for idiom in iter_json_array(source):
+                names.append(idiom["name"])
+                kinds.append(sys.intern(idiom["kind"].strip()))
+                for text in (idiom["definition"], idiom["example"]):
+                    data = text.encode("utf-8")
+                    strings_file.write(data)
+                    offsets.append(offsets[-1] + len(data))
+    except (ValueError, KeyError):
+        os.remove(strings_path + tmp_suffix)
+        raise
+    new_names = list(OrderedDict.fromkeys(name for name in names
+                                          if name not in lemmas))
+    if processes > 1 and new_names:
+        with ProcessPoolExecutor(processes, initializer=af.get_tagger) as pool:
+            analyses = af.analyze_sents(new_names, pool)
+    else:
+        analyses = af.analyze_sents(new_names)
+    lemmas = dict(lemmas)
+    for name, analysis in zip(new_names, analyses):
+        lemmas[name] = tuple(sys.intern(lemma) for lemma in analysis.lemmas)
+    logger.info("%d of %d idioms lemmatized", len(new_names), len(names))
+    entries = [(name, lemmas[name], kind)
+               for name, kind in zip(names, kinds)]
+    lemma_index = build_lemma_index((lemmatized, kind) for
+                                    _, lemmatized, kind in entries)
+    index = {"version": INDEX_VERSION,
+             "digest": digest,
+             "entries": entries,
+             "lemma_index": lemma_index.to_dict(),
+             "offsets": offsets}
+    with open(index_path + tmp_suffix, "wb") as index_file:
+        pickle.dump(index, index_file, pickle.HIGHEST_PROTOCOL)
+    os.replace(strings_path + tmp_suffix, strings_path)
+    os.replace(index_path + tmp_suffix, index_path)
+    return entries, lemma_index, StringTable(strings_path, offsets)
+
+
+def load_index(source_path=IDIOMS_PATH, index_path=None):
+    """
+    (str, str) -> list, LemmaIndex, StringTable.
+
+    Return entries of the precompiled index, inverted index of their
+    lemmas and table of their strings. Index is rebuilt when it or its
+    string table is missing, has another version or was built from another
+    source file, in which case only added or changed names are lemmatized.
+    """
+    if index_path is None:
+        index_path = get_index_path(source_path)
+    strings_path = get_strings_path(index_path)
+    try:
+        with open(index_path, "rb") as index_file:
+            index = pickle.load(index_file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return build_index(source_path, index_path)
+    if index.get("version") != INDEX_VERSION:
+        return build_index(source_path, index_path)
+    try:
+        strings_size = os.path.getsize(strings_path)
+    except OSError:
+        strings_size = None
+    if index["digest"] != source_digest(source_path) or \
+            index["offsets"][-1] != strings_size:
+        return build_index(source_path, index_path, lemmas={
+            name: lemmatized for name, lemmatized, _ in index["entries"]})
+    return (index["entries"], LemmaIndex(**index["lemma_index"]),
+            StringTable(strings_path, index["offsets"]))
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else IDIOMS_PATH
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    print(len(build_index(path, processes=processes)[0]),
+          "idioms indexed to", get_index_path(path))
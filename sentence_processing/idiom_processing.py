@@ -1,20 +1,63 @@
 from collections import defaultdict
 from pprint import pprint
-import json
 from . import auxiliar_functions as af
+from . import idiom_index
+from .idiom_index import INSEPARABLE_KINDS, REPLACING_WORDS, SEPARABLE_KINDS
+from .instrumentation import span
+
+
+def split_analysis(lemmatized_sen):
+    """
+    (list) -> list, list.
+
+    Return lemmas of sentence and counts of verbs and adverbs before every
+    position if sentence is AnalyzedSentence or None if it is list of
+    lemmas.
+    """
+    if isinstance(lemmatized_sen, af.AnalyzedSentence):
+        return lemmatized_sen.lemmas, lemmatized_sen.get_gap_counts()
+    return lemmatized_sen, None
 
 
 class IdiomExpression:
-    """This class represents idiom expression."""
+    """
+    This class represents idiom expression. Definition and example can be
+    kept in table of strings of dictionary, which is read only when they
+    are needed.
+    """
 
-    def __init__(self, name, definition, example, kind):
-        """Initialize idiom expression with name, definition and example."""
+    __slots__ = ("name", "lemmatized", "kind", "_definition", "_example",
+                 "_strings")
+
+    def __init__(self, name, definition, example, kind, lemmatized=None,
+                 strings=None):
+        """
+        Initialize idiom expression with name, definition and example, which
+        are numbers of strings in strings if it is given.
+        """
         self.name = name
-        self.lemmatized = af.get_lemmatized_sen(name)
-        self.definition = definition
-        self.example = example
+        if lemmatized is None:
+            lemmatized = af.get_lemmatized_sen(name)
+        self.lemmatized = tuple(lemmatized)
+        self._definition = definition
+        self._example = example
+        self._strings = strings
         self.kind = kind.strip()
 
+    @property
+    def definition(self):
+        """Definition of idiom."""
+        if self._strings is None:
+            return self._definition
+        return self._strings[self._definition]
+
+    @property
+    def example(self):
+        """Example of idiom."""
+        if self._strings is None:
+            return self._example
+        return self._strings[self._example]
+
     def __repr__(self):
         """Represent idiom in repr form."""
         return "<Idiom: " + self.name + ": " + self.definition + ": " +\
@@ -24,17 +67,29 @@ class IdiomExpression:
         """
         (self, list) -> tuple.
 
-        Check sentence if it has idiom expression.
+        Check sentence if it has idiom expression. Sentence can be given as
+        list of lemmas or as AnalyzedSentence.
         """
+        lemmatized_sen, gap_counts = split_analysis(lemmatized_sen)
         answer = None
         if self.kind == "inseparable" or self.kind == "intransitive":
             answer = self._check_inseparable(lemmatized_sen)
         elif self.kind == "separable [optional]":
             answer = self._check_inseparable(lemmatized_sen) or \
-                self._check_separable(lemmatized_sen)
+                self._check_separable(lemmatized_sen, gap_counts)
         elif self.kind == "separable [obligatory]":
-            answer = self._check_separable(lemmatized_sen)
-        if answer and answer[0] == answer[1]:
+            answer = self._check_separable(lemmatized_sen, gap_counts)
+        if answer:
+            return self._get_index_list(answer)
+
+    def _get_index_list(self, answer):
+        """
+        (self, tuple) -> tuple.
+
+        Return indexes of idiom's words in sentence from positions of its
+        first and second parts.
+        """
+        if answer[0] == answer[1]:
             return tuple([answer[0]] + [answer[1] + i + 1
                 for i in range(len(self.lemmatized) - 1)])
         elif answer:
@@ -54,10 +109,8 @@ class IdiomExpression:
             except ValueError:
                 return False
             try:
-                replacing_words = set(["you", "your", "someone", "something",
-                                       "somebody"])
                 for word in range(st, st + len(self.lemmatized)):
-                    if self.lemmatized[word - st] in replacing_words:
+                    if self.lemmatized[word - st] in REPLACING_WORDS:
                         continue
                     if lemmatized_sen[word] != self.lemmatized[word - st]:
                         break
@@ -66,11 +119,14 @@ class IdiomExpression:
             except IndexError:
                 break
 
-    def _check_separable(self, lemmatized_sen):
+    def _check_separable(self, lemmatized_sen, gap_counts=None):
         """
-        (self, list) -> int, int.
+        (self, list, list) -> int, int.
 
-        Check sentence if it has an separable idiom expression.
+        Check sentence if it has an separable idiom expression. Words
+        between parts of idiom can't be verbs or adverbs, which are counted
+        by gap_counts of analyzed sentence or found by tagging the gap when
+        gap_counts are not given.
         """
         fst = -1
         while(True):
@@ -81,13 +137,18 @@ class IdiomExpression:
                     lemmatized_sen[fst + 1:].index(self.lemmatized[1])
             except ValueError:
                 return False
-            if snd - fst > 7 or snd - fst < 2:
+            if snd - fst > 7 or snd - fst < 2 or \
+                    snd + len(self.lemmatized) - 1 > len(lemmatized_sen):
                 continue
             else:
                 for i in range(2, len(self.lemmatized)):
                     if lemmatized_sen[snd + i - 1] != self.lemmatized[i]:
                         break
                 else:
+                    if gap_counts is not None:
+                        if gap_counts[snd] - gap_counts[fst + 1]:
+                            return False
+                        return fst, snd
                     for token in af.get_pos_tokens_list(lemmatized_sen[
                             fst + 1: snd]):
                         if token[1][:2] == "VB" or token[1][0] == "R":
@@ -95,12 +156,108 @@ class IdiomExpression:
                     return fst, snd
 
 
+class IdiomMatcher:
+    """
+    Represents multi-pattern matcher of idioms over lemmatized sentence.
+
+    Inseparable idioms are stored in trie keyed by lemmas, where words from
+    REPLACING_WORDS after the first one become wildcards, so all of them are
+    found in one pass over sentence. Separable idioms are verified only when
+    both of their first lemmas occur in sentence.
+    """
+
+    _ANY = object()
+    _END = object()
+
+    def __init__(self, expressions):
+        """
+        (self, iterable) -> None.
+
+        Initialize matcher with idioms in order of their dictionary.
+        """
+        self.expressions = list(expressions)
+        self.trie = {}
+        self.separable = defaultdict(list)
+        for ordinal, exp in enumerate(self.expressions):
+            if exp.kind in INSEPARABLE_KINDS or \
+                    exp.kind == "separable [optional]":
+                self._insert(ordinal, exp.lemmatized)
+            if exp.kind in SEPARABLE_KINDS:
+                self.separable[exp.lemmatized[0]].append(ordinal)
+
+    def _insert(self, ordinal, lemmatized):
+        """
+        (self, int, list) -> None.
+
+        Add idiom's lemmas to trie.
+        """
+        node = self.trie.setdefault(lemmatized[0], {})
+        for lemma in lemmatized[1:]:
+            if lemma in REPLACING_WORDS:
+                lemma = self._ANY
+            node = node.setdefault(lemma, {})
+        node.setdefault(self._END, []).append(ordinal)
+
+    def _match_inseparable(self, lemmatized_sen):
+        """
+        (self, list) -> dict.
+
+        Return dict where key is ordinal of idiom and value is position of its
+        first occurrence in sentence.
+        """
+        found = {}
+        length = len(lemmatized_sen)
+        for start, lemma in enumerate(lemmatized_sen):
+            node = self.trie.get(lemma)
+            if node is None:
+                continue
+            stack = [(node, start + 1)]
+            while stack:
+                node, pos = stack.pop()
+                for ordinal in node.get(self._END, ()):
+                    found.setdefault(ordinal, start)
+                if pos < length and lemmatized_sen[pos] in node:
+                    stack.append((node[lemmatized_sen[pos]], pos + 1))
+                if self._ANY in node:
+                    stack.append((node[self._ANY], pos + 1))
+        return found
+
+    def find_idioms(self, lemmatized_sen):
+        """
+        (self, list) -> defaultdict.
+
+        Return idioms that are in lemmatized sentence. Sentence can be given
+        as list of lemmas or as AnalyzedSentence.
+        """
+        lemmatized_sen, gap_counts = split_analysis(lemmatized_sen)
+        found = {ordinal: (start, start) for ordinal, start in
+                 self._match_inseparable(lemmatized_sen).items()}
+        sen_lemmas = set(lemmatized_sen)
+        for lemma in sen_lemmas:
+            for ordinal in self.separable.get(lemma, ()):
+                exp = self.expressions[ordinal]
+                if ordinal in found or exp.lemmatized[1] not in sen_lemmas:
+                    continue
+                answer = exp._check_separable(lemmatized_sen, gap_counts)
+                if answer:
+                    found[ordinal] = answer
+        idioms = defaultdict(list)
+        for ordinal in sorted(found):
+            exp = self.expressions[ordinal]
+            idioms[exp._get_index_list(found[ordinal])].append(exp)
+        return idioms
+
+
 class IdiomDict:
     """Represents dictionary of idioms."""
 
     def __init__(self):
         """Initialize class with empty dict."""
         self.idioms = defaultdict(list)
+        self.expressions = []
+        self._matcher = None
+        self._lemma_index = None
+        self._ordinals = None
 
     def add_idiom(self, idiom):
         """
@@ -109,6 +266,57 @@ class IdiomDict:
         Add idiom to dictionary.
         """
         self.idioms[idiom.name].append(idiom)
+        self.expressions.append(idiom)
+        self._matcher = None
+        self._lemma_index = None
+        self._ordinals = None
+
+    def set_lemma_index(self, lemma_index):
+        """
+        (self, LemmaIndex) -> None.
+
+        Use inverted index that was built for idioms in order of their
+        addition.
+        """
+        self._lemma_index = lemma_index
+
+    def get_lemma_index(self):
+        """
+        (self) -> LemmaIndex.
+
+        Return inverted index of lemmas of all idioms of dictionary.
+        """
+        if self._lemma_index is None:
+            self._lemma_index = idiom_index.build_lemma_index(
+                (exp.lemmatized, exp.kind) for exp in self.expressions)
+        return self._lemma_index
+
+    def get_candidates(self, lemmatized_sen, lemma=None):
+        """
+        (self, list, str) -> list.
+
+        Return idioms whose required lemmas are all in lemmatized sentence
+        in order of dictionary. When lemma is given, only idioms that can
+        have it are returned.
+        """
+        if self._ordinals is None:
+            ordinals = {id(exp): ordinal for ordinal, exp in
+                        enumerate(self.get_matcher().expressions)}
+            self._ordinals = [ordinals[id(exp)] for exp in self.expressions]
+        numbers = self.get_lemma_index().get_candidates(lemmatized_sen, lemma)
+        numbers.sort(key=self._ordinals.__getitem__)
+        return [self.expressions[number] for number in numbers]
+
+    def get_matcher(self):
+        """
+        (self) -> IdiomMatcher.
+
+        Return matcher built from all idioms of dictionary.
+        """
+        if self._matcher is None:
+            self._matcher = IdiomMatcher(
+                exp for idiom in self for exp in self[idiom])
+        return self._matcher
 
     def __getitem__(self, key):
         """
@@ -134,11 +342,31 @@ class IdiomDict:
         """
         return self.idioms.__iter__()
 
-    def find_idioms(self, lemmatized_sen):
+    def find_idioms(self, lemmatized_sen, lemma=None):
+        """
+        (self, list, str) -> defaultdict.
+
+        Return idioms that are in lemmatized sentence. When lemma is given,
+        only idioms that can have it are checked, so idioms of other words
+        of sentence can be missing.
+        """
+        with span("idiom_match"):
+            if lemma is None:
+                return self.get_matcher().find_idioms(lemmatized_sen)
+            idioms = defaultdict(list)
+            for exp in self.get_candidates(
+                    split_analysis(lemmatized_sen)[0], lemma):
+                index_list = exp.check_sentence(lemmatized_sen)
+                if index_list:
+                    idioms[index_list].append(exp)
+            return idioms
+
+    def find_idioms_linear(self, lemmatized_sen):
         """
         (self, list) -> defaultdict.
 
-        Return idioms that are in lemmatized sentence.
+        Return idioms that are in lemmatized sentence checking every idiom
+        one by one. Result is the same as of find_idioms.
         """
         idioms = defaultdict(list)
         for idiom in self:
@@ -149,39 +377,47 @@ class IdiomDict:
         return idioms
 
 
-def get_all_idioms_dict():
+def get_all_idioms_dict(path=idiom_index.IDIOMS_PATH):
     """
-    (None) -> IdiomDict.
+    (str) -> IdiomDict.
 
-    Return dictionary with all idioms.
+    Return dictionary with all idioms and inverted index of their lemmas
+    loaded from precompiled index of file in path. Definitions and examples
+    are read from string table of index when they are needed.
     """
-    idioms = json.loads(open("expressions.json").read().strip())
     idiom_dict = IdiomDict()
-    for idiom in idioms:
-        idiom_dict.add_idiom(IdiomExpression(idiom["name"],
-                                             idiom["definition"],
-                                             idiom["example"],
-                                             idiom["kind"]))
+    entries, lemma_index, strings = idiom_index.load_index(path)
+    for number, (name, lemmatized, kind) in enumerate(entries):
+        idiom_dict.add_idiom(IdiomExpression(name, 2 * number,
+                                             2 * number + 1, kind,
+                                             lemmatized, strings))
+    idiom_dict.set_lemma_index(lemma_index)
     return idiom_dict
 
 
-def get_idiom(sentence, word, word_order, idiom_dict=None):
+def get_idiom(sentence, word, word_order, idiom_dict=None,
+              possible_idioms=None):
     """
-    (str, str, int, IdiomDict) -> str, str, list.
+    (str, str, int, IdiomDict, dict) -> str, str, list.
 
-    Return idiom if word is part of it or None either.
+    Return idiom if word is part of it or None either. Sentence can be
+    already analyzed and idioms of sentence can be already found, otherwise
+    only idioms that can have lemma of word are checked.
     """
-    if not idiom_dict:
-        idiom_dict = get_all_idioms_dict()
-    lemmatized_sen = af.get_lemmatized_sen(sentence)
-    lemma = af.lemmatize_word(sentence, word, word_order)
+    analysis = af.analyze(sentence)
+    lemmatized_sen = analysis.lemmas
+    lemma = analysis.lemmatize_word(word, word_order)
     current_ord = 0
     for num, word in enumerate(lemmatized_sen):
         if word == lemma:
             if current_ord == word_order:
                 break
             current_ord += 1
-    possible_idioms = idiom_dict.find_idioms(lemmatized_sen)
+    if possible_idioms is None:
+        if not idiom_dict:
+            idiom_dict = get_all_idioms_dict()
+        possible_idioms = idiom_dict.find_idioms(analysis,
+                                                 lemmatized_sen[num])
     idioms_num = list(filter(lambda x: num in x, possible_idioms))
     if(not idioms_num):
         return None
@@ -0,0 +1,184 @@
+from threading import Lock, Thread
+from time import monotonic, perf_counter, time
+from . import idiom_index
+from . import instrumentation
+from .idiom_processing import get_all_idioms_dict
+import logging
+import os
+
+CHECK_INTERVAL = 10
+GENERATION_INTERVAL = 1
+RELOAD_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+logger = logging.getLogger(__name__)
+
+
+def get_signature(path):
+    """
+    (str) -> tuple.
+
+    Return modification time and size of file in path or None if it can't
+    be read.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_generation_path(source_path):
+    """
+    (str) -> str.
+
+    Return path of generation file, which changes make every process that
+    uses idioms from source_path reload them.
+    """
+    return source_path + ".generation"
+
+
+def prepare(idiom_dict):
+    """
+    (IdiomDict) -> IdiomDict.
+
+    Return dictionary with its matcher and order of candidates built, so
+    that first request after swap does not build them.
+    """
+    idiom_dict.get_matcher()
+    idiom_dict.get_candidates([])
+    return idiom_dict
+
+
+class IdiomReloader:
+    """
+    Represents idiom dictionary that is rebuilt from its source file in
+    background when file changes or reload is requested. New dictionary is
+    swapped in at once, so requests that already got the old one keep
+    using it. Reloads requested in one process are seen by other processes
+    through generation file next to source file.
+    """
+
+    def __init__(self, path=idiom_index.IDIOMS_PATH,
+                 check_interval=CHECK_INTERVAL, on_reload=None):
+        """
+        Initialize reloader with dictionary loaded from path. Source file is
+        checked for changes at most every check_interval seconds, 0 turns
+        checks off. Generation file is checked every GENERATION_INTERVAL
+        seconds regardless. On_reload is called with new dictionary after
+        swap.
+        """
+        self.path = path
+        self.generation_path = get_generation_path(path)
+        self.generation = get_signature(self.generation_path)
+        self.check_interval = check_interval
+        self.on_reload = on_reload
+        self.signature = get_signature(path)
+        self.idiom_dict = prepare(get_all_idioms_dict(path))
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload = time()
+        self._next_check = monotonic() + check_interval
+        self._next_generation_check = monotonic() + GENERATION_INTERVAL
+        self._reload_lock = Lock()
+        self._thread_lock = Lock()
+        self._thread = None
+
+    def get(self):
+        """
+        (self) -> IdiomDict.
+
+        Return current dictionary, starting reload in background if source
+        file has changed since it was loaded or reload was requested by
+        another process.
+        """
+        now = monotonic()
+        if now >= self._next_generation_check:
+            self._next_generation_check = now + GENERATION_INTERVAL
+            generation = get_signature(self.generation_path)
+            if generation != self.generation and self.reload_in_background():
+                self.generation = generation
+        if self.check_interval and now >= self._next_check:
+            self._next_check = now + self.check_interval
+            if get_signature(self.path) != self.signature:
+                self.reload_in_background()
+        return self.idiom_dict
+
+    def reload(self):
+        """
+        (self) -> bool.
+
+        Build new dictionary from source file and swap it in. Return False
+        if source file can't be loaded, then old dictionary is kept.
+        """
+        with self._reload_lock:
+            start = perf_counter()
+            signature = get_signature(self.path)
+            try:
+                idiom_dict = prepare(get_all_idioms_dict(self.path))
+            except (OSError, ValueError, KeyError) as error:
+                self.failures += 1
+                self.signature = signature
+                logger.error("reload of idioms from %s failed: %s",
+                             self.path, error)
+                return False
+            self.idiom_dict = idiom_dict
+            self.signature = signature
+            self.reloads += 1
+            self.last_reload = time()
+            if self.on_reload is not None:
+                self.on_reload(idiom_dict)
+            elapsed = perf_counter() - start
+        instrumentation.observe("idiom_reload_seconds", elapsed)
+        logger.info("%d idioms reloaded from %s in %.3f s",
+                    len(idiom_dict.expressions), self.path, elapsed)
+        return True
+
+    def reload_in_background(self):
+        """
+        (self) -> bool.
+
+        Start reload in background thread and return True, or return False
+        if reload is already running.
+        """
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = Thread(target=self.reload, daemon=True)
+            self._thread.start()
+            return True
+
+    def request_reload(self):
+        """
+        (self) -> bool.
+
+        Start reload in background and change generation file, so that
+        other processes reload too. Return False if reload is already
+        running in this process.
+        """
+        tmp_path = self.generation_path + ".{}.tmp".format(os.getpid())
+        with open(tmp_path, "w") as generation_file:
+            generation_file.write("{} {}\n".format(os.getpid(), time()))
+        os.replace(tmp_path, self.generation_path)
+        self.generation = get_signature(self.generation_path)
+        return self.reload_in_background()
+
+    def get_samples(self):
+        """
+        (self) -> list.
+
+        Return (name, type, description, value) samples of reloads.
+        """
+        return [("idioms", "gauge", "Number of idioms in dictionary.",
+                 len(self.idiom_dict.expressions)),
+                ("idiom_reloads_total", "counter",
+                 "Number of reloads of idiom dictionary.", self.reloads),
+                ("idiom_reload_failures_total", "counter",
+                 "Number of failed reloads of idiom dictionary.",
+                 self.failures),
+                ("idiom_last_reload_timestamp_seconds", "gauge",
+                 "Time when idiom dictionary was loaded.", self.last_reload)]
+
+
+instrumentation.get_histogram("idiom_reload_seconds",
+                              "Time of reloads of idiom dictionary.",
+                              RELOAD_BUCKETS)
@@ -1,6 +1,6 @@
-import graph_word_wsd
-import auxiliar_functions as af
-import idiom_processing as ip
+from . import graph_word_wsd
+from . import auxiliar_functions as af
+from . import idiom_processing as ip
 from pprint import pprint
 
 
@@ -8,27 +8,30 @@ def get_idiom_definitions(sentence, word, word_order):
     """
     (str, str, int) -> list.
 
-    Find best definitions for idiom.
+    Find best definitions for idiom. Subgraphs of definitions and examples
+    are added to graph of sentence in place.
     """
-    idiom_name, _, def_examples = ip.get_idiom(sentence, word, word_order)
-    lemmas_set = af.get_sen_lemmas_set(sentence)
+    analysis = af.analyze(sentence)
+    idiom_name, _, def_examples = ip.get_idiom(analysis, word, word_order)
+    lemmas_set = analysis.get_lemmas_set()
     graph = graph_word_wsd.build_word_graph(lemmas_set, word)
 
     graph.add_vertex("start")
     for num, sense in enumerate(def_examples):
-        new_sense = num
+        new_sense = ("sense", num)
         graph.add_vertex(new_sense)
         graph.add_edge("start", new_sense)
 
         lemmas_set = af.get_sen_lemmas_set(sense["definition"].lower())
-        gr = graph_word_wsd.build_word_graph(lemmas_set, new_sense, True, 1)
-        graph.merge(gr)
+        graph_word_wsd.build_word_graph(lemmas_set, new_sense, True, 1,
+                                        graph=graph)
 
         lemmas_set = af.get_sen_lemmas_set(sense["example"].lower())
-        gr = graph_word_wsd.build_word_graph(lemmas_set, new_sense, True)
-        graph.merge(gr)
+        graph_word_wsd.build_word_graph(lemmas_set, new_sense, True,
+                                        graph=graph)
 
-    definitions = graph_word_wsd.get_top_synsets(graph, "start", True)
+    definitions = [sense for _, sense in
+                   graph_word_wsd.get_top_synsets(graph, "start", True)]
     # print(list(map(lambda x: def_examples[x], definitions)))
     # print(definitions)
     return definitions
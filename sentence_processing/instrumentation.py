@@ -0,0 +1,453 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock, Thread
+from time import perf_counter, sleep
+import json
+import logging
+import os
+
+PREFIX = "ebook_"
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+                2.5, 5, 10)
+SIZE_BUCKETS = (10, 100, 1000, 5000, 10000, 50000, 100000, 500000)
+ITERATION_BUCKETS = (5, 10, 20, 30, 50, 75, 100)
+DUMP_INTERVAL = 1
+
+logger = logging.getLogger(__name__)
+
+_histograms = OrderedDict()
+_counters = OrderedDict()
+_lock = Lock()
+_sample_sources = []
+_directory = None
+_dumper_pid = None
+_dump_lock = Lock()
+
+
+def format_labels(labels, bound=None):
+    """
+    (list, object) -> str.
+
+    Return labels of sample in Prometheus text format, bound is upper
+    bound of bucket.
+    """
+    if bound is not None:
+        labels = labels + ["le=\"{}\"".format(bound)]
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Histogram:
+    """
+    Represents histogram of observed values, where every set of labels has
+    its own cumulative buckets, sum and count.
+    """
+
+    def __init__(self, name, description, buckets):
+        """Initialize empty histogram with upper bounds of buckets."""
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.series = OrderedDict()
+        self.lock = Lock()
+
+    def observe(self, value, **labels):
+        """
+        (self, float) -> None.
+
+        Add value to series of histogram with labels.
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            if key not in self.series:
+                self.series[key] = [[0] * len(self.buckets), 0, 0]
+            counts, _, _ = series = self.series[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def empty(self):
+        """
+        (self) -> Histogram.
+
+        Return histogram with the same name and buckets and no values.
+        """
+        return Histogram(self.name, self.description, self.buckets)
+
+    def add(self, key, series):
+        """
+        (self, tuple, list) -> None.
+
+        Add series of other histogram with the same buckets to series with
+        labels key.
+        """
+        counts, total, count = series
+        with self.lock:
+            if key not in self.series:
+                self.series[key] = [[0] * len(self.buckets), 0, 0]
+            own = self.series[key]
+            own[0] = [a + b for a, b in zip(own[0], counts)]
+            own[1] += total
+            own[2] += count
+
+    def render(self):
+        """
+        (self) -> list.
+
+        Return lines of histogram in Prometheus text format.
+        """
+        lines = ["# HELP {} {}".format(self.name, self.description),
+                 "# TYPE {} histogram".format(self.name)]
+        with self.lock:
+            for key, (counts, total, count) in self.series.items():
+                labels = ["{}=\"{}\"".format(name, value)
+                          for name, value in key]
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append("{}_bucket{} {}".format(
+                        self.name, format_labels(labels, bound),
+                        bucket_count))
+                lines.append("{}_bucket{} {}".format(
+                    self.name, format_labels(labels, "+Inf"), count))
+                lines.append("{}_sum{} {}".format(
+                    self.name, format_labels(labels), total))
+                lines.append("{}_count{} {}".format(
+                    self.name, format_labels(labels), count))
+        return lines
+
+
+class Counter:
+    """
+    Represents counter of events, where every set of labels has its own
+    total.
+    """
+
+    def __init__(self, name, description):
+        """Initialize counter with no events."""
+        self.name = name
+        self.description = description
+        self.series = OrderedDict()
+        self.lock = Lock()
+
+    def inc(self, value=1, **labels):
+        """
+        (self, float) -> None.
+
+        Add value to total of counter with labels.
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + value
+
+    def empty(self):
+        """
+        (self) -> Counter.
+
+        Return counter with the same name and no events.
+        """
+        return Counter(self.name, self.description)
+
+    def add(self, key, total):
+        """
+        (self, tuple, float) -> None.
+
+        Add total of other counter to total with labels key.
+        """
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + total
+
+    def render(self):
+        """
+        (self) -> list.
+
+        Return lines of counter in Prometheus text format.
+        """
+        lines = ["# HELP {} {}".format(self.name, self.description),
+                 "# TYPE {} counter".format(self.name)]
+        with self.lock:
+            for key, total in self.series.items():
+                labels = ["{}=\"{}\"".format(name, value)
+                          for name, value in key]
+                lines.append("{}{} {}".format(self.name, format_labels(labels),
+                                              total))
+        return lines
+
+
+def get_counter(name, description=""):
+    """
+    (str, str) -> Counter.
+
+    Return counter with name, creating it on first use.
+    """
+    name = PREFIX + name
+    with _lock:
+        if name not in _counters:
+            _counters[name] = Counter(name, description)
+        return _counters[name]
+
+
+def inc(name, **labels):
+    """
+    (str) -> None.
+
+    Add one event to counter with name.
+    """
+    get_counter(name).inc(**labels)
+
+
+def get_histogram(name, description="", buckets=TIME_BUCKETS):
+    """
+    (str, str, tuple) -> Histogram.
+
+    Return histogram with name, creating it on first use.
+    """
+    name = PREFIX + name
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(name, description, buckets)
+        return _histograms[name]
+
+
+def observe(name, value, **labels):
+    """
+    (str, float) -> None.
+
+    Add value to histogram with name. Histograms of sizes have to be
+    created with their buckets before.
+    """
+    get_histogram(name).observe(value, **labels)
+
+
+@contextmanager
+def span(stage):
+    """
+    (str) -> None.
+
+    Measure time of block of code as stage of request.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        get_histogram("stage_seconds").observe(elapsed, stage=stage)
+        logger.debug("%s took %.6f s", stage, elapsed)
+        if _directory is not None and _dumper_pid != os.getpid():
+            start_dumper()
+
+
+def timed(stage):
+    """
+    (str) -> function.
+
+    Return decorator that measures time of function as stage of request.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_samples(source):
+    """
+    (function) -> None.
+
+    Add function that returns (name, type, description, value) samples,
+    which are rendered with counters and histograms. Samples of type
+    counter are summed over processes, other ones are labelled with pid.
+    """
+    _sample_sources.append(source)
+
+
+def get_metrics():
+    """
+    (None) -> list.
+
+    Return all counters and histograms of this process.
+    """
+    with _lock:
+        return list(_counters.values()) + list(_histograms.values())
+
+
+def get_state():
+    """
+    (None) -> dict.
+
+    Return series of counters and histograms and samples of this process.
+    """
+    metrics = {}
+    for metric in get_metrics():
+        with metric.lock:
+            metrics[metric.name] = list(metric.series.items())
+    return {"metrics": metrics,
+            "samples": [sample for source in _sample_sources
+                        for sample in source()]}
+
+
+def set_directory(path):
+    """
+    (str) -> None.
+
+    Share metrics of this process and of processes forked from it through
+    files in directory at path, so that render returns metrics of all of
+    them. Files that are already in directory are removed.
+    """
+    global _directory
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".json"):
+            os.remove(os.path.join(path, name))
+    _directory = path
+
+
+def dump():
+    """
+    (None) -> None.
+
+    Save state of this process to its file in shared directory.
+    """
+    path = os.path.join(_directory, "{}.json".format(os.getpid()))
+    state = get_state()
+    with _dump_lock:
+        with open(path + ".tmp", "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(path + ".tmp", path)
+
+
+def run_dumper():
+    """
+    (None) -> None.
+
+    Save state of this process every DUMP_INTERVAL seconds.
+    """
+    while True:
+        sleep(DUMP_INTERVAL)
+        try:
+            dump()
+        except OSError as error:
+            logger.warning("metrics were not saved: %s", error)
+
+
+def start_dumper():
+    """
+    (None) -> None.
+
+    Start thread that saves state of this process, once per process.
+    """
+    global _dumper_pid
+    with _lock:
+        if _dumper_pid == os.getpid():
+            return
+        _dumper_pid = os.getpid()
+    Thread(target=run_dumper, daemon=True).start()
+
+
+def load_states():
+    """
+    (None) -> list.
+
+    Return (pid, state) pairs of all processes that saved their state to
+    shared directory.
+    """
+    states = []
+    for name in sorted(os.listdir(_directory)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(_directory, name)) as state_file:
+                states.append((name[:-len(".json")], json.load(state_file)))
+        except (OSError, ValueError):
+            continue
+    return states
+
+
+def merge(states):
+    """
+    (list) -> list, list.
+
+    Return counters and histograms with series of (pid, state) pairs
+    summed and samples of states, where samples that are not counters are
+    labelled with pid.
+    """
+    metrics = [metric.empty() for metric in get_metrics()]
+    by_name = {metric.name: metric for metric in metrics}
+    samples = OrderedDict()
+    for pid, state in states:
+        for name, series in state["metrics"].items():
+            if name not in by_name:
+                continue
+            for key, value in series:
+                by_name[name].add(tuple(tuple(label) for label in key),
+                                  value)
+        for name, kind, description, value in state["samples"]:
+            labels = [] if kind == "counter" else ["pid=\"{}\"".format(pid)]
+            key = (name, format_labels(labels))
+            if key in samples:
+                samples[key][3] += value
+            else:
+                samples[key] = [name, kind, description, value]
+    return metrics, [tuple(sample) + (labels,)
+                     for (_, labels), sample in samples.items()]
+
+
+def render(samples=()):
+    """
+    (list) -> str.
+
+    Return all counters, histograms and samples in Prometheus text format,
+    together with samples of this process that are not shared. When
+    directory is shared, metrics of all processes that use it are merged,
+    otherwise only metrics of this process are returned.
+    """
+    if _directory is None:
+        metrics = get_metrics()
+        samples = [sample + ("",) for sample in list(samples) + [
+            sample for source in _sample_sources for sample in source()]]
+    else:
+        dump()
+        metrics, samples = merge(load_states() + [
+            (str(os.getpid()), {"metrics": {}, "samples": list(samples)})])
+    lines = []
+    described = set()
+    for name, kind, description, value, labels in samples:
+        if name not in described:
+            described.add(name)
+            lines.extend(["# HELP {}{} {}".format(PREFIX, name, description),
+                          "# TYPE {}{} {}".format(PREFIX, name, kind)])
+        lines.append("{}{}{} {}".format(PREFIX, name, labels, value))
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """
+    (None) -> None.
+
+    Drop all values of counters and histograms. It is called in forked
+    processes, so that values they got from parent are not counted twice.
+    """
+    global _lock, _dump_lock
+    _lock = Lock()
+    _dump_lock = Lock()
+    for metric in list(_counters.values()) + list(_histograms.values()):
+        metric.lock = Lock()
+        metric.series = OrderedDict()
+
+
+get_counter("senses_total", "Number of answered senses by degradation.")
+get_counter("deadline_hits_total",
+            "Number of stages skipped because deadline of request passed.")
+get_histogram("stage_seconds", "Time spent in stages of request in seconds.")
+get_histogram("graph_vertexes", "Number of vertexes of ranked graphs.",
+              SIZE_BUCKETS)
+get_histogram("graph_edges", "Number of edges of ranked graphs.",
+              SIZE_BUCKETS)
+get_histogram("pagerank_iterations", "Number of PageRank iterations.",
+              ITERATION_BUCKETS)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset)
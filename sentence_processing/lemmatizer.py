@@ -0,0 +1,138 @@
+from collections import Counter
+from functools import lru_cache
+from nltk.corpus import stopwords
+from nltk.corpus import wordnet as wn
+from nltk.stem import WordNetLemmatizer
+import json
+import os
+import sys
+
+MORPHOLOGY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "morphology_table.json")
+MORPHOLOGY_SIZE = 20000
+LEMMA_CACHE_SIZE = 65536
+
+_stopwords = None
+_lemmatizer = None
+_morphology = {}
+
+
+def get_stopwords():
+    """
+    (None) -> frozenset.
+
+    Return English stopwords that are loaded once per process.
+    """
+    global _stopwords
+    if _stopwords is None:
+        _stopwords = frozenset(stopwords.words("english"))
+    return _stopwords
+
+
+def get_lemmatizer():
+    """
+    (None) -> WordNetLemmatizer.
+
+    Return lemmatizer that is created once per process.
+    """
+    global _lemmatizer
+    if _lemmatizer is None:
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer
+
+
+def compute_lemma(word, pos, past):
+    """
+    (str, str, bool) -> str.
+
+    Return lemma of word that is WordNet pos, past is True when word is
+    tagged as VB, VBD or VBN and None when its tag is unknown.
+    """
+    if pos:
+        poss_lemm = wn._morphy(word, pos)
+    else:
+        poss_lemm = ""
+    if len(poss_lemm) == 1:
+        return poss_lemm[0]
+    else:
+        if past is None:
+            raise IndexError("tag of word is unknown")
+        if past:
+            for w in poss_lemm:
+                if w != word:
+                    return w
+    return get_lemmatizer().lemmatize(word)
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word, pos, past):
+    """
+    (str, str, bool) -> str.
+
+    Return lemma of word that is WordNet pos from morphology table or
+    compute it. Recently used lemmas are remembered.
+    """
+    lemma = _morphology.get((word, pos, past))
+    if lemma is None:
+        lemma = compute_lemma(word, pos, past)
+    return lemma
+
+
+def build_morphology(forms, size=MORPHOLOGY_SIZE, path=MORPHOLOGY_PATH):
+    """
+    (iterable, int, str) -> dict.
+
+    Save lemmas of size most frequent forms, which are (word, pos, past)
+    triples, to path and return table, where key is form and value is its
+    lemma.
+    """
+    table = {form: compute_lemma(*form) for form, _ in
+             Counter(forms).most_common(size)}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as table_file:
+        json.dump({"wordnet": wn.get_version(),
+                   "forms": [list(form) + [lemma] for form, lemma in
+                             table.items()]},
+                  table_file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return table
+
+
+def load_morphology(path=MORPHOLOGY_PATH):
+    """
+    (str) -> int.
+
+    Load morphology table from path and return number of its forms. Table
+    that is missing or was built with another WordNet is not loaded.
+    """
+    global _morphology
+    try:
+        with open(path, encoding="utf-8") as table_file:
+            saved = json.load(table_file)
+    except (OSError, ValueError):
+        return 0
+    if saved.get("wordnet") != wn.get_version():
+        return 0
+    _morphology = {(word, pos, past): lemma
+                   for word, pos, past, lemma in saved["forms"]}
+    lemmatize.cache_clear()
+    return len(_morphology)
+
+
+if __name__ == "__main__":
+    from . import auxiliar_functions as af
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python -m sentence_processing.lemmatizer "
+                 "CORPUS_FILE [SIZE]")
+    forms = []
+    with open(sys.argv[1], encoding="utf-8") as corpus_file:
+        for line in corpus_file:
+            if not line.strip():
+                continue
+            tokens_dict = af.AnalyzedSentence(line.lower()).get_tokens_dict()
+            for token, tags in tokens_dict.items():
+                forms.extend(af.get_form(token, tokens_dict, order)
+                             for order in range(len(tags)))
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else MORPHOLOGY_SIZE
+    print(len(build_morphology(forms, size)), "forms saved to",
+          MORPHOLOGY_PATH)
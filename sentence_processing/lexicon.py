@@ -0,0 +1,85 @@
+from nltk.corpus import stopwords
+from . import oxford
+import json
+import os
+import sys
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "closed_class_lexicon.json")
+CLOSED_CLASS_TAGS = ("CC", "CD", "DT", "IN", "PRP", "UH")
+
+_lexicon = None
+
+
+def build_lexicon(words=None, path=LEXICON_PATH):
+    """
+    (list, str) -> dict.
+
+    Export definitions of closed-class words from Oxford API to lexicon
+    file and return lexicon, where key is word and value is dict of
+    definitions by part-of-speech tag. English stopwords are exported when
+    words are not given. Exported Oxford text is for local use only, the
+    lexicon in repository is written by hand and can be redistributed.
+    """
+    if words is None:
+        words = stopwords.words("english")
+    backend = oxford.get_backend()
+    lexicon = {}
+    for word in sorted(set(words)):
+        entry = backend.fetch(word)
+        if not entry:
+            continue
+        lexicon[word] = {}
+        for tag in CLOSED_CLASS_TAGS:
+            try:
+                definitions = oxford.parse_definitions(entry, tag)
+            except (KeyError, IndexError):
+                continue
+            if definitions:
+                lexicon[word][tag] = definitions
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as lexicon_file:
+        json.dump(lexicon, lexicon_file, ensure_ascii=False, sort_keys=True,
+                  separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return lexicon
+
+
+def load_lexicon(path=LEXICON_PATH):
+    """
+    (str) -> dict.
+
+    Return lexicon from file or empty lexicon if there is no such file.
+    """
+    try:
+        with open(path, encoding="utf-8") as lexicon_file:
+            return json.load(lexicon_file)
+    except FileNotFoundError:
+        return {}
+
+
+def get_lexicon():
+    """
+    (None) -> dict.
+
+    Return lexicon that is loaded once per process.
+    """
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = load_lexicon()
+    return _lexicon
+
+
+def lookup(word, word_pos):
+    """
+    (str, str) -> list.
+
+    Return definitions of word that is word_pos or None if word is not in
+    lexicon with this part-of-speech.
+    """
+    return get_lexicon().get(word, {}).get(word_pos)
+
+
+if __name__ == "__main__":
+    lexicon = build_lexicon(sys.argv[1:] or None)
+    print(len(lexicon), "words saved to", LEXICON_PATH)
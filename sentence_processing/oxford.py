@@ -0,0 +1,269 @@
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from . import auxiliar_functions
+from .instrumentation import span
+import json
+import os
+import requests
+import sqlite3
+
+OXFORD_URL = "https://od-api.oxforddictionaries.com:443/api/v1/entries/en/"
+APP_ID = os.environ.get("OXFORD_APP_ID", "0dd8f390")
+APP_KEY = os.environ.get("OXFORD_APP_KEY",
+                         "1671423a9398f671e334350676749918")
+TIMEOUT = (3.05, 10)
+POOL_SIZE = 10
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "oxford_cache.sqlite3")
+CACHE_TTL = 30 * 24 * 60 * 60
+NEGATIVE_TTL = 24 * 60 * 60
+MEMORY_CACHE_SIZE = 1024
+
+_cache = None
+_backend = None
+
+
+class OxfordBackend:
+    """Fetches entries from Oxford Dictionaries API with pooled session."""
+
+    def __init__(self, app_id=APP_ID, app_key=APP_KEY, timeout=TIMEOUT):
+        """Initialize backend with credentials and timeout of requests."""
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"app_id": app_id, "app_key": app_key})
+        adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE,
+                                                pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, word):
+        """
+        (self, str) -> dict.
+
+        Return entry of word from Oxford API or None if there is no such
+        word.
+        """
+        response = self.session.get(OXFORD_URL + word, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+
+class StubBackend:
+    """Returns entries from dictionary instead of Oxford API."""
+
+    def __init__(self, entries=None):
+        """Initialize backend with dictionary, where key is word."""
+        self.entries = entries or {}
+        self.requests = 0
+
+    def fetch(self, word):
+        """
+        (self, str) -> dict.
+
+        Return entry of word or None if there is no such word.
+        """
+        self.requests += 1
+        return self.entries.get(word)
+
+
+class LookupCache:
+    """
+    Represents cache of Oxford definitions, where key is word and
+    part-of-speech. Recently used definitions are kept in memory in front
+    of SQLite store, missing words are cached with shorter TTL.
+    """
+
+    MISS = object()
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL,
+                 negative_ttl=NEGATIVE_TTL, size=MEMORY_CACHE_SIZE):
+        """Initialize cache, path None keeps definitions only in memory."""
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.size = size
+        self.memory = OrderedDict()
+        self.lock = Lock()
+        self._connection = None
+        self._pid = None
+
+    def _get_connection(self):
+        """
+        (self) -> Connection.
+
+        Return connection to SQLite store that is opened once per process.
+        """
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path,
+                                               check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS definitions (word TEXT, pos TEXT,"
+                " expires REAL, definitions TEXT, PRIMARY KEY (word, pos))")
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, word, pos):
+        """
+        (self, str, str) -> list.
+
+        Return cached definitions of word that is pos, None for cached
+        missing word or LookupCache.MISS if there is nothing in cache.
+        """
+        key = (word, pos)
+        with self.lock:
+            if key in self.memory:
+                expires, definitions = self.memory[key]
+                if expires > time():
+                    self.memory.move_to_end(key)
+                    return definitions
+                del self.memory[key]
+            if self.path is None:
+                return self.MISS
+            row = self._get_connection().execute(
+                "SELECT expires, definitions FROM definitions "
+                "WHERE word = ? AND pos = ?", key).fetchone()
+        if row is None or row[0] <= time():
+            return self.MISS
+        definitions = json.loads(row[1])
+        self._remember(key, row[0], definitions)
+        return definitions
+
+    def set(self, word, pos, definitions):
+        """
+        (self, str, str, list) -> None.
+
+        Save definitions of word that is pos, None marks missing word.
+        """
+        ttl = self.ttl if definitions is not None else self.negative_ttl
+        expires = time() + ttl
+        self._remember((word, pos), expires, definitions)
+        if self.path is None:
+            return
+        with self.lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO definitions VALUES (?, ?, ?, ?)",
+                    (word, pos, expires, json.dumps(definitions)))
+
+    def _remember(self, key, expires, definitions):
+        """
+        (self, tuple, float, list) -> None.
+
+        Keep definitions in memory, dropping least recently used ones.
+        """
+        with self.lock:
+            self.memory[key] = (expires, definitions)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.size:
+                self.memory.popitem(last=False)
+
+
+def configure(cache=None, backend=None):
+    """
+    (LookupCache, object) -> None.
+
+    Replace cache or backend that are used for lookups.
+    """
+    global _cache, _backend
+    if cache is not None:
+        _cache = cache
+    if backend is not None:
+        _backend = backend
+
+
+def get_cache():
+    """
+    (None) -> LookupCache.
+
+    Return cache of definitions.
+    """
+    global _cache
+    if _cache is None:
+        _cache = LookupCache()
+    return _cache
+
+
+def get_backend():
+    """
+    (None) -> OxfordBackend.
+
+    Return backend that fetches entries.
+    """
+    global _backend
+    if _backend is None:
+        _backend = OxfordBackend()
+    return _backend
+
+
+def parse_definitions(entry, word_pos):
+    """
+    (dict, str) -> list.
+
+    Return definitions with examples from Oxford entry for word that is
+    word_pos.
+    """
+    word_definitions = list()
+    for lexical_category in entry["results"][0]["lexicalEntries"]:
+        for definition in lexical_category["entries"][0]["senses"]:
+            try:
+                wn_lexical_cat = auxiliar_functions.oxf_2_wn(
+                    lexical_category["lexicalCategory"])
+                if wn_lexical_cat == word_pos:
+                    word_definitions.append({
+                        "definition": definition["definitions"][0],
+                        "example": definition["examples"][0]["text"]
+                    })
+            except KeyError:
+                pass
+    return word_definitions
+
+
+def lookup_cached(word, word_pos):
+    """
+    (str, str) -> list.
+
+    Return cached definitions of word that is word_pos, empty list for
+    cached missing word or None if there is nothing in cache.
+    """
+    definitions = get_cache().get(word, word_pos)
+    if definitions is LookupCache.MISS:
+        return None
+    return definitions or []
+
+
+def store(word, word_pos, entry):
+    """
+    (str, str, dict) -> list.
+
+    Return definitions of word that is word_pos from Oxford entry, which
+    is None for missing word, and save them to cache. Entries that can't
+    be parsed are not cached and give no definitions.
+    """
+    try:
+        definitions = parse_definitions(entry, word_pos) if entry else None
+    except (KeyError, IndexError):
+        return []
+    get_cache().set(word, word_pos, definitions)
+    return definitions or []
+
+
+def lookup(word, word_pos, remote=True):
+    """
+    (str, str, bool) -> list.
+
+    Return definitions of word that is word_pos from cache or Oxford API,
+    which is not requested when remote is False. Failed requests and
+    entries that can't be parsed are not cached and give no definitions.
+    """
+    definitions = lookup_cached(word, word_pos)
+    if definitions is not None or not remote:
+        return definitions or []
+    try:
+        with span("oxford_fetch"):
+            entry = get_backend().fetch(word)
+    except (requests.RequestException, ValueError):
+        return []
+    return store(word, word_pos, entry)
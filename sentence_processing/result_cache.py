@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from threading import Lock
+from nltk.corpus import wordnet as wn
+from . import idiom_index
+from .book_index import normalize_sentence
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+RESULT_CACHE_VERSION = 4
+MEMORY_LIMIT = 64 * 1024 * 1024
+
+
+def get_cache_version(idioms_path=idiom_index.IDIOMS_PATH):
+    """
+    (str) -> str.
+
+    Return version of cached senses that changes with idioms source file
+    and WordNet version.
+    """
+    version = "{} {} {}".format(RESULT_CACHE_VERSION,
+                                idiom_index.source_digest(idioms_path),
+                                wn.get_version())
+    return hashlib.sha1(version.encode("utf-8")).hexdigest()
+
+
+def get_key(sentence, word, word_order):
+    """
+    (str, str, int) -> tuple.
+
+    Return key of senses of word that is in sentence in word_order.
+    """
+    return normalize_sentence(sentence), word.lower().strip(), int(word_order)
+
+
+def get_size(key, senses):
+    """
+    (tuple, str) -> int.
+
+    Return number of bytes that cached senses take in memory.
+    """
+    return sys.getsizeof(key) + sys.getsizeof(key[0]) + \
+        sys.getsizeof(key[1]) + sys.getsizeof(senses)
+
+
+class ResultCache:
+    """
+    Represents cache of senses, where key is normalized sentence, word and
+    word order. Senses are kept in memory as JSON until their total size
+    reaches limit and least recently used ones are dropped, optionally in
+    front of SQLite store that survives restarts.
+    """
+
+    def __init__(self, version, path=None, limit=MEMORY_LIMIT):
+        """
+        Initialize cache of senses with version, path None keeps senses
+        only in memory.
+        """
+        self.version = version
+        self.path = path
+        self.limit = limit
+        self.memory = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+        self._connection = None
+        self._pid = None
+
+    def _get_connection(self):
+        """
+        (self) -> Connection.
+
+        Return connection to SQLite store that is opened once per process.
+        Senses of other versions are removed from store when it is opened.
+        """
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path,
+                                               check_same_thread=False)
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results (sentence TEXT,"
+                    " word TEXT, word_order INTEGER, version TEXT,"
+                    " senses TEXT, PRIMARY KEY (sentence, word, word_order))")
+                self._connection.execute(
+                    "DELETE FROM results WHERE version != ?", (self.version,))
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, sentence, word, word_order):
+        """
+        (self, str, str, int) -> dict.
+
+        Return cached senses of word that is in sentence in word_order or
+        None if they are not in cache.
+        """
+        key = get_key(sentence, word, word_order)
+        with self.lock:
+            senses = self.memory.get(key)
+            if senses is not None:
+                self.memory.move_to_end(key)
+            elif self.path is not None:
+                row = self._get_connection().execute(
+                    "SELECT senses FROM results WHERE sentence = ?"
+                    " AND word = ? AND word_order = ? AND version = ?",
+                    key + (self.version,)).fetchone()
+                if row is not None:
+                    senses = row[0]
+                    self._remember(key, senses)
+            if senses is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(senses)
+
+    def set(self, sentence, word, word_order, senses, version=None):
+        """
+        (self, str, str, int, dict, str) -> None.
+
+        Save senses of word that is in sentence in word_order. Senses that
+        were computed for version other than current one are not saved.
+        """
+        key = get_key(sentence, word, word_order)
+        senses = json.dumps(senses)
+        with self.lock:
+            if version is not None and version != self.version:
+                return
+            self._remember(key, senses)
+            if self.path is None:
+                return
+            connection = self._get_connection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                    key + (self.version, senses))
+
+    def set_version(self, version):
+        """
+        (self, str) -> None.
+
+        Drop all senses and use version for new ones. Senses of other
+        versions are removed from store when it is opened next time.
+        """
+        with self.lock:
+            self.version = version
+            self.memory.clear()
+            self.size = 0
+            if self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
+
+    def _remember(self, key, senses):
+        """
+        (self, tuple, str) -> None.
+
+        Keep senses in memory, dropping least recently used ones while
+        their size is above limit. Lock has to be held.
+        """
+        if key in self.memory:
+            self.size -= get_size(key, self.memory.pop(key))
+        self.memory[key] = senses
+        self.size += get_size(key, senses)
+        while self.size > self.limit and self.memory:
+            old_key, old_senses = self.memory.popitem(last=False)
+            self.size -= get_size(old_key, old_senses)
+
+    def stats(self):
+        """
+        (self) -> dict.
+
+        Return counters of hits and misses and size of cache in memory.
+        """
+        with self.lock:
+            return {"version": self.version, "hits": self.hits,
+                    "misses": self.misses, "entries": len(self.memory),
+                    "size": self.size, "limit": self.limit}
@@ -0,0 +1,60 @@
+from .definitions import get_definitions
+from .idiom_processing import get_idiom
+from .instrumentation import inc
+
+
+def get_idiom_sense(analysis, word, word_order, idiom_dict,
+                    possible_idioms=None):
+    """
+    (AnalyzedSentence, str, int, IdiomDict, dict) -> dict.
+
+    Return idiom sense of word that is in analyzed sentence in word_order
+    or None if word is not part of idiom.
+    """
+    try:
+        i_word, i_category, i_defs = get_idiom(analysis, word, word_order,
+                                               idiom_dict, possible_idioms)
+    except TypeError:
+        return None
+    return {"definitions": i_defs, "category": i_category,
+            "idiom_name": i_word}
+
+
+def make_senses(word, category, defs, idiom_sense, budget_hit=None,
+                degraded=False):
+    """
+    (str, str, list, dict, str, bool) -> dict.
+
+    Return response with word and idiom senses, budget_hit is name of limit
+    of WordNet graph that was reached, degraded is True when senses come
+    from fast tier instead of graph ranking or Oxford API.
+    """
+    inc("senses_total", degraded=str(degraded).lower())
+    return {"senses":
+            {"word_sense": {"definitions": defs, "category": category},
+             "idiom_sense": idiom_sense},
+            "word": word,
+            "budget_hit": budget_hit,
+            "degraded": degraded}
+
+
+def get_senses(analysis, word, word_order, idiom_dict, possible_idioms=None,
+               ranking=None, budget=None, fast=False):
+    """
+    (AnalyzedSentence, str, int, IdiomDict, dict, tuple, GraphBudget,
+     bool) -> dict.
+
+    Return word and idiom senses of word that is in analyzed sentence in
+    word_order. WordNet graph is built within budget unless ranking is
+    given. Fast tier is used when fast is True or deadline of budget
+    passes.
+    """
+    idiom_sense = get_idiom_sense(analysis, word, word_order, idiom_dict,
+                                  possible_idioms)
+    uses_graph = analysis.get_pos_wn(word, word_order)
+    word, category, defs = get_definitions(analysis, word, word_order,
+                                           ranking, budget, fast)
+    budget_hit = budget.hit if budget is not None and uses_graph else None
+    degraded = fast or (budget is not None and budget.hit == "deadline")
+    return make_senses(word, category, defs, idiom_sense, budget_hit,
+                       degraded)
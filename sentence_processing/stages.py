@@ -0,0 +1,59 @@
+from . import auxiliar_functions
+from . import definitions
+from . import lemmatizer
+from . import lexicon
+from . import wordnet_relations
+from .idiom_reload import IdiomReloader
+from .senses import get_idiom_sense
+
+_idioms = None
+
+
+def init_worker():
+    """
+    (None) -> None.
+
+    Load idiom dictionary, WordNet relations, lexicon and morphology table
+    of worker process unless they were loaded before it was forked. Idiom
+    dictionary is reloaded when its source file changes.
+    """
+    global _idioms
+    if _idioms is None:
+        _idioms = IdiomReloader()
+        lemmatizer.load_morphology()
+    wordnet_relations.get_table()
+    lexicon.get_lexicon()
+
+
+def find_idiom_sense(sentence, word, word_order):
+    """
+    (str, str, int) -> dict.
+
+    Return idiom sense of word that is in sentence in word_order or None.
+    """
+    init_worker()
+    return get_idiom_sense(auxiliar_functions.analyze(sentence), word,
+                           word_order, _idioms.get())
+
+
+def find_word_sense(sentence, word, word_order, budget=None, fast=False):
+    """
+    (str, str, int, GraphBudget, bool) -> tuple, str, str.
+
+    Return (word, part-of-speech, definitions) of word that is in sentence
+    in word_order and None, or (word, Penn tag, None) and "oxford" when
+    definitions have to be fetched from Oxford API, and name of limit of
+    budget of WordNet graph that was reached. First WordNet senses are
+    returned when fast is True or deadline of budget passes.
+    """
+    init_worker()
+    analysis = auxiliar_functions.analyze(sentence)
+    if analysis.get_pos_wn(word, word_order):
+        return definitions.get_wn_definitions(
+            analysis, word, word_order, budget=budget, fast=fast), None, \
+            budget.hit if budget else None
+    word_pos = analysis.get_tag(word, word_order)
+    senses = definitions.get_lexicon_definitions(word, word_pos)
+    if senses:
+        return senses, None, None
+    return (word, word_pos, None), "oxford", None
@@ -0,0 +1,194 @@
+from functools import lru_cache
+from nltk.corpus import wordnet as wn
+import numpy as np
+import os
+import sys
+
+RELATIONS_VERSION = 2
+RELATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "wordnet_relations.npz")
+EXPANSION_CACHE_SIZE = 4096
+POS_CODES = {wn.NOUN: 0, wn.VERB: 1, wn.ADJ: 2, wn.ADJ_SAT: 2, wn.ADV: 3}
+POS_NAMES = (wn.NOUN, wn.VERB, wn.ADJ, wn.ADV)
+
+_table = None
+
+
+def get_synset_key(synset):
+    """
+    (synset) -> int.
+
+    Return key of synset that is made from its offset and part-of-speech.
+    """
+    return synset.offset() * 4 + POS_CODES[synset.pos()]
+
+
+def get_similar(synset):
+    """
+    (synset) -> set.
+
+    Return set with all synsets that are similar to this synset.
+    """
+    similar_words = set()
+    similar_words.update(synset.member_holonyms())
+    similar_words.update(synset.member_meronyms())
+    similar_words.update(synset.hypernyms())
+    similar_words.update(synset.hyponyms())
+    similar_words.update(synset.part_holonyms())
+    similar_words.update(synset.part_meronyms())
+    return similar_words
+
+
+class RelationTable:
+    """
+    Represents relations of all WordNet synsets in CSR form.
+
+    Synsets are numbered by position of their key in sorted array keys and
+    neighbours of synset i are indices[indptr[i]:indptr[i + 1]]. Prior is
+    PageRank of synsets in graph of all relations.
+    """
+
+    def __init__(self, keys, indptr, indices, prior):
+        """
+        Initialize table with sorted keys, relations between them and their
+        PageRank.
+        """
+        self.keys = keys
+        self.indptr = indptr
+        self.indices = indices
+        self.prior = prior
+        self.expand = lru_cache(maxsize=EXPANSION_CACHE_SIZE)(self._expand)
+
+    def __len__(self):
+        """
+        (self) -> int.
+
+        Return number of synsets in table.
+        """
+        return len(self.keys)
+
+    def index_of(self, synset):
+        """
+        (self, synset) -> int.
+
+        Return number of synset in table.
+        """
+        key = get_synset_key(synset)
+        index = int(np.searchsorted(self.keys, key))
+        if index == len(self.keys) or self.keys[index] != key:
+            raise KeyError(synset)
+        return index
+
+    def synset_of(self, index):
+        """
+        (self, int) -> synset.
+
+        Return synset that has number index in table.
+        """
+        key = int(self.keys[index])
+        return wn.synset_from_pos_and_offset(POS_NAMES[key % 4], key // 4)
+
+    def neighbours(self, indexes):
+        """
+        (self, ndarray) -> ndarray.
+
+        Return concatenated neighbours of all synsets from indexes.
+        """
+        starts = self.indptr[indexes]
+        lengths = self.indptr[indexes + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.indices[offsets + np.arange(lengths.sum())]
+
+    def get_edges(self, indexes):
+        """
+        (self, ndarray) -> ndarray, ndarray.
+
+        Return sources and targets of all relations of synsets from indexes.
+        """
+        lengths = self.indptr[indexes + 1] - self.indptr[indexes]
+        return np.repeat(indexes, lengths), self.neighbours(indexes)
+
+    def _expand(self, index, depth):
+        """
+        (self, int, int) -> ndarray.
+
+        Return sorted numbers of synsets that are reachable from synset
+        with number index in at most depth relations.
+        """
+        visited = np.zeros(len(self), dtype=bool)
+        visited[index] = True
+        frontier = np.array([index], dtype=np.int64)
+        for _ in range(depth):
+            if not len(frontier):
+                break
+            frontier = np.unique(self.neighbours(frontier))
+            frontier = frontier[~visited[frontier]]
+            visited[frontier] = True
+        expanded = np.flatnonzero(visited)
+        expanded.flags.writeable = False
+        return expanded
+
+
+def build_table(path=RELATIONS_PATH):
+    """
+    (str) -> RelationTable.
+
+    Build table of relations from WordNet corpus, rank all synsets by
+    PageRank and save them to path.
+    """
+    from .graph_word_wsd import csr_pagerank
+    synsets = list(wn.all_synsets())
+    keys = np.array(sorted(set(get_synset_key(synset)
+                               for synset in synsets)), dtype=np.int64)
+    neighbours = [[] for _ in range(len(keys))]
+    for synset in synsets:
+        index = np.searchsorted(keys, get_synset_key(synset))
+        neighbours[index] = sorted(
+            np.searchsorted(keys, get_synset_key(similar))
+            for similar in get_similar(synset))
+    indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in neighbours], out=indptr[1:])
+    indices = np.fromiter((index for row in neighbours for index in row),
+                          dtype=np.int64, count=int(indptr[-1]))
+    prior = csr_pagerank(indptr, indices)[0].astype(np.float32)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, version=np.array(RELATIONS_VERSION),
+             wordnet=np.array(wn.get_version()),
+             keys=keys, indptr=indptr, indices=indices, prior=prior)
+    os.replace(tmp_path, path)
+    return RelationTable(keys, indptr, indices, prior)
+
+
+def load_table(path=RELATIONS_PATH):
+    """
+    (str) -> RelationTable.
+
+    Return table of relations saved in path. Table is rebuilt when it is
+    missing or was built with another version or WordNet.
+    """
+    try:
+        with np.load(path) as saved:
+            if int(saved["version"]) == RELATIONS_VERSION and \
+                    str(saved["wordnet"]) == wn.get_version():
+                return RelationTable(saved["keys"], saved["indptr"],
+                                     saved["indices"], saved["prior"])
+    except (OSError, KeyError, ValueError):
+        pass
+    return build_table(path)
+
+
+def get_table():
+    """
+    (None) -> RelationTable.
+
+    Return table of relations that is loaded once per process.
+    """
+    global _table
+    if _table is None:
+        _table = load_table()
+    return _table
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else RELATIONS_PATH
+    print(len(build_table(path)), "synsets saved to", path)
@@ -0,0 +1,68 @@
+"""
+Run server with pre-forked worker processes.
+
+Usage: python serve.py
+
+Idiom dictionary, WordNet relations, WordNet corpus and POS tagger are
+loaded and a warm-up request is answered in master process before workers
+are forked, so every worker starts ready and shares these pages with
+master copy-on-write. Address and number of workers are taken from
+config.Config (BIND and WORKERS environment variables). Workers share
+their metrics through files in Config.METRICS_DIR, or in temporary
+directory when it is not set, so /metrics of any worker returns metrics
+of all of them. Metrics of warm-up request are not counted.
+"""
+import gc
+import json
+import tempfile
+from gunicorn.app.base import BaseApplication
+from app import app, routes
+from config import Config
+from sentence_processing import instrumentation
+
+
+class PreforkServer(BaseApplication):
+    """Gunicorn server for application that is already loaded."""
+
+    def __init__(self, application, options):
+        """Initialize server with loaded application and gunicorn options."""
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        """Set gunicorn options."""
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        """Return loaded application."""
+        return self.application
+
+
+def warm_up(application):
+    """
+    (Flask) -> None.
+
+    Answer warm-up request, so lazily loaded corpora and models are loaded
+    before workers are forked.
+    """
+    response = application.test_client().post(
+        "/", data=json.dumps(application.config["WARMUP_REQUEST"]))
+    if response.status_code != 200:
+        raise RuntimeError("Warm-up request failed: " + response.status)
+
+
+if __name__ == "__main__":
+    warm_up(app)
+    routes.result_cache.hits = routes.result_cache.misses = 0
+    instrumentation.reset()
+    instrumentation.set_directory(Config.METRICS_DIR or
+                                  tempfile.mkdtemp(prefix="ebook_metrics_"))
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    PreforkServer(app, {"bind": Config.BIND,
+                        "workers": Config.WORKERS,
+                        "timeout": Config.WORKER_TIMEOUT,
+                        "preload_app": True}).run()
@@ -0,0 +1,175 @@
+"""
+Run asynchronous server with WSD stages in process pool.
+
+Usage: python serve_async.py
+
+Idiom and WordNet stages of every request run concurrently in pool of
+Config.WORKERS processes, while Oxford lookups are awaited with
+non-blocking HTTP client, so slow API calls do not hold pool workers. At
+most Config.MAX_CONCURRENT stages are submitted to pool at once, and
+requests beyond Config.MAX_PENDING in flight are rejected with 503.
+Requests that pass Config.GRAPH_DEADLINE or ask for "tier": "fast" get
+first WordNet senses and only cached Oxford definitions. Metrics of pool
+workers are shared with /metrics through files in Config.METRICS_DIR,
+or in temporary directory when it is not set.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+import asyncio
+import json
+import logging
+import tempfile
+import aiohttp
+from aiohttp import web
+from config import Config
+from sentence_processing import auxiliar_functions, oxford, stages
+from sentence_processing.graph_word_wsd import GraphBudget
+from sentence_processing import instrumentation
+from sentence_processing.instrumentation import inc, render, span
+from sentence_processing.senses import make_senses
+
+
+class DefinitionsServer:
+    """Serves definitions running CPU-bound stages in process pool."""
+
+    def __init__(self, workers=Config.WORKERS,
+                 max_concurrent=Config.MAX_CONCURRENT,
+                 max_pending=Config.MAX_PENDING):
+        """Initialize server with preloaded data and pool of workers."""
+        stages.init_worker()
+        self.pool = ProcessPoolExecutor(workers,
+                                        initializer=stages.init_worker)
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.pending = 0
+        self.semaphore = None
+        self.session = None
+
+    async def start(self, application):
+        """Open HTTP session and limit of concurrent stages."""
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.session = aiohttp.ClientSession(
+            headers={"app_id": oxford.APP_ID, "app_key": oxford.APP_KEY},
+            timeout=aiohttp.ClientTimeout(sock_connect=oxford.TIMEOUT[0],
+                                          sock_read=oxford.TIMEOUT[1]),
+            connector=aiohttp.TCPConnector(limit=oxford.POOL_SIZE))
+
+    async def stop(self, application):
+        """Close HTTP session and pool of workers."""
+        await self.session.close()
+        self.pool.shutdown()
+
+    async def run_stage(self, stage, *args):
+        """
+        (self, function, ...) -> object.
+
+        Return result of stage that is run in pool of workers.
+        """
+        async with self.semaphore:
+            return await asyncio.get_event_loop().run_in_executor(
+                self.pool, stage, *args)
+
+    async def fetch_oxford(self, word, word_pos, remote=True):
+        """
+        (self, str, str, bool) -> list.
+
+        Return definitions of word that is word_pos from cache or Oxford
+        API, which is not requested when remote is False. Only request
+        differs from oxford.lookup, cache and parsing are shared with it.
+        """
+        loop = asyncio.get_event_loop()
+        definitions = await loop.run_in_executor(None, oxford.lookup_cached,
+                                                 word, word_pos)
+        if definitions is not None or not remote:
+            return definitions or []
+        try:
+            with span("oxford_fetch"):
+                async with self.session.get(oxford.OXFORD_URL + word) \
+                        as response:
+                    if response.status == 404:
+                        entry = None
+                    else:
+                        response.raise_for_status()
+                        entry = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return []
+        return await loop.run_in_executor(None, oxford.store, word, word_pos,
+                                          entry)
+
+    async def handle(self, request):
+        """Give user opportunity to get definitions using POST request."""
+        if self.pending >= self.max_pending:
+            return web.json_response({"error": "server is busy"}, status=503)
+        self.pending += 1
+        try:
+            with span("request"):
+                return await self.get_response(request)
+        finally:
+            self.pending -= 1
+
+    async def get_response(self, request):
+        """
+        (self, Request) -> Response.
+
+        Return definitions of word from POST request.
+        """
+        data_dict = json.loads(await request.read())
+        sentence = data_dict.get("sentence").lower().strip()
+        word = data_dict.get("word").lower().strip()
+        word_order = int(data_dict.get("word_order"))
+        tier = data_dict.get("tier", "full")
+        if tier not in ("full", "fast"):
+            return web.json_response(
+                {"error": "tier should be full or fast"}, status=400)
+        fast = tier == "fast"
+        budget = GraphBudget(Config.GRAPH_MAX_VERTEXES, Config.GRAPH_MAX_EDGES,
+                             monotonic() + Config.GRAPH_DEADLINE)
+        idiom_sense, (word_sense, source, budget_hit) = await asyncio.gather(
+            self.run_stage(stages.find_idiom_sense, sentence, word,
+                           word_order),
+            self.run_stage(stages.find_word_sense, sentence, word,
+                           word_order, budget, fast))
+        degraded = fast or budget_hit == "deadline"
+        word, category, defs = word_sense
+        if source == "oxford":
+            if not fast and budget.expired():
+                inc("deadline_hits_total", stage="oxford")
+                degraded = True
+            defs = await self.fetch_oxford(word, category, not degraded)
+            category = auxiliar_functions.wn_2_oxf(category)
+        return web.json_response(make_senses(word, category, defs,
+                                             idiom_sense, budget_hit,
+                                             degraded))
+
+    async def metrics(self, request):
+        """
+        Give user opportunity to get timings in Prometheus format, merged
+        from this process and workers of pool.
+        """
+        samples = [("pending_requests", "gauge",
+                    "Number of requests in flight.", self.pending)]
+        return web.Response(text=render(samples),
+                            content_type="text/plain")
+
+
+def create_app():
+    """
+    (None) -> Application.
+
+    Return application that serves definitions.
+    """
+    server = DefinitionsServer()
+    application = web.Application()
+    application.router.add_post("/", server.handle)
+    application.router.add_get("/metrics", server.metrics)
+    application.on_startup.append(server.start)
+    application.on_cleanup.append(server.stop)
+    return application
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=Config.LOG_LEVEL)
+    instrumentation.set_directory(Config.METRICS_DIR or
+                                  tempfile.mkdtemp(prefix="ebook_metrics_"))
+    host, port = Config.BIND.rsplit(":", 1)
+    web.run_app(create_app(), host=host, port=int(port))
@@ -0,0 +1,51 @@
+"""Check that /batch gives every word of sentence the same senses as single
+lookup of this word.
+
+Run from repository root: python -m pytest tests
+"""
+import json
+import unittest
+from app import app, routes
+from sentence_processing import definitions, oxford
+
+SENTENCES = [
+    "the bank raised interest rates after the board meeting",
+    "she gave the book back to him after a week",
+    "as soon as i got off the bus, i bumped into a schoolmate",
+    "we must do what we can before they have the answer",
+]
+
+
+class BatchSensesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        oxford.configure(oxford.LookupCache(path=None), oxford.StubBackend())
+        routes.result_cache.limit = 0
+        routes.result_cache.path = None
+        app.config["GRAPH_DEADLINE"] = 600
+        cls.client = app.test_client()
+
+    def post(self, path, data):
+        response = self.client.post(path, data=json.dumps(data))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data.decode("utf-8"))
+
+    def test_same_senses(self):
+        for sentence in SENTENCES:
+            words = sentence.replace(",", "").split()
+            targets = [{"word": word, "word_order": 0}
+                       for word in sorted(set(words), key=words.index)]
+            definitions._rankings.clear()
+            batch = self.post("/batch", {"sentences": [
+                {"sentence": sentence, "targets": targets}]})
+            for target, batch_senses in zip(
+                    targets, batch["results"][0]["targets"]):
+                with self.subTest(sentence=sentence, word=target["word"]):
+                    definitions._rankings.clear()
+                    senses = self.post("/", dict(target, sentence=sentence))
+                    self.assertEqual(senses, batch_senses)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Check that trie matcher and inverted index of lemmas find the same idioms
+as checking every idiom one by one, for sentences made of all entries of
+idiom dictionary.
+
+Run from repository root: python -m pytest tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from sentence_processing import auxiliar_functions as af
+from sentence_processing import idiom_index
+from sentence_processing.idiom_processing import get_all_idioms_dict
+
+GAP_WORD = "it"
+
+
+def get_sentences(path):
+    """
+    (str) -> list.
+
+    Return lemmatized name, name with a gap after its first word and
+    example of every entry of idiom source file in path.
+    """
+    sentences = []
+    with open(path) as idioms_file:
+        for entry in idiom_index.iter_json_array(idioms_file):
+            name = af.get_lemmatized_sen(entry["name"])
+            sentences.append(name)
+            if len(name) > 1:
+                sentences.append(name[:1] + [GAP_WORD] + name[1:])
+            if entry["example"]:
+                sentences.append(af.get_lemmatized_sen(
+                    entry["example"].lower()))
+    return sentences
+
+
+class IdiomMatcherTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        path = os.path.join(cls.directory, "expressions.json")
+        shutil.copy(idiom_index.IDIOMS_PATH, path)
+        cls.idiom_dict = get_all_idioms_dict(path)
+        cls.sentences = get_sentences(path)
+        cls.expected = [cls.idiom_dict.find_idioms_linear(sentence)
+                        for sentence in cls.sentences]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def assert_same_idioms(self, found, expected):
+        self.assertEqual(list(found), list(expected))
+        for index_list in expected:
+            self.assertEqual([id(exp) for exp in found[index_list]],
+                             [id(exp) for exp in expected[index_list]])
+
+    def test_trie(self):
+        for sentence, expected in zip(self.sentences, self.expected):
+            with self.subTest(sentence=sentence):
+                self.assert_same_idioms(self.idiom_dict.find_idioms(sentence),
+                                        expected)
+
+    def test_lemma_candidates(self):
+        for sentence, expected in zip(self.sentences, self.expected):
+            for lemma in set(sentence):
+                with self.subTest(sentence=sentence, lemma=lemma):
+                    found = self.idiom_dict.find_idioms(sentence, lemma)
+                    found_ids = {id(exp) for exps in found.values()
+                                 for exp in exps}
+                    for index_list, exps in expected.items():
+                        for exp in exps:
+                            if lemma in exp.lemmatized:
+                                self.assertIn(id(exp), found_ids)
+                    self.assert_same_idioms(found, {
+                        index_list: [exp for exp in exps
+                                     if id(exp) in found_ids]
+                        for index_list, exps in expected.items()
+                        if any(id(exp) in found_ids for exp in exps)})
+
+
+if __name__ == "__main__":
+    unittest.main()